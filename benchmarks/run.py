@@ -0,0 +1,198 @@
+"""Benchmark the example puzzles headlessly.
+
+Run from the repository root, e.g.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --baseline results.json --threshold 0.2
+
+Each puzzle and mode runs in a fresh process, so peak memory and model build
+time aren't shared between them. Exits with status 1 if any metric regresses
+past the threshold compared to the baseline.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+# Modules at the repository root that build a `puzzle` when imported.
+PUZZLES = (
+    "example",
+    "example_with_bifurcations",
+    "greenbelt",
+    "silent_night",
+    "pure_whispers",
+    "nine_wheels",
+    "circle_final",
+)
+MODES = ("single", "multiprocess")
+# Metrics where larger is worse, compared against the baseline.
+REGRESSION_METRICS = (
+    "build_seconds",
+    "solve_seconds",
+    "search_nodes",
+    "peak_rss_mb",
+)
+DEFAULT_THRESHOLD = 0.25
+# Differences below these are noise, however large relative to the baseline.
+MIN_DIFFERENCES = {"build_seconds": 0.01, "solve_seconds": 0.05}
+
+
+def run_case(name: str, mode: str) -> dict:
+    """Build and solve one puzzle in this process, returning its metrics."""
+    # Import the solver first, so the build time is just the model's.
+    importlib.import_module("sudoku.puzzle")
+    start_time = time.perf_counter()
+    puzzle = importlib.import_module(name).puzzle
+    build_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    num_solutions = puzzle.count_solutions(multiprocess=mode == "multiprocess")
+    solve_seconds = time.perf_counter() - start_time
+
+    # Kilobytes on Linux, bytes on macOS. Children are the finished workers.
+    peak_rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    if sys.platform != "darwin":
+        peak_rss *= 1024
+    return {
+        "puzzle": name,
+        "mode": mode,
+        "solutions": num_solutions,
+        "build_seconds": build_seconds,
+        "solve_seconds": solve_seconds,
+        "wall_seconds": build_seconds + solve_seconds,
+        "search_nodes": puzzle.search_nodes,
+        "propagation_passes": puzzle.propagation_passes,
+        "nodes_per_second": puzzle.search_nodes / solve_seconds,
+        "peak_rss_mb": peak_rss / 2**20,
+    }
+
+
+def run_case_in_subprocess(name: str, mode: str, timeout: float | None) -> dict:
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--case", name, mode],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return {"puzzle": name, "mode": mode, "error": "timed out"}
+    if completed.returncode:
+        return {
+            "puzzle": name,
+            "mode": mode,
+            "error": (completed.stderr.strip().splitlines() or ["failed"])[-1],
+        }
+    # The solve may print progress, so the metrics are the last line.
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def find_regressions(
+    results: list[dict], baseline: list[dict], threshold: float
+) -> list[str]:
+    """Describe each metric that got worse by more than `threshold`."""
+    baseline_cases = {(case["puzzle"], case["mode"]): case for case in baseline}
+    regressions = []
+    for case in results:
+        old_case = baseline_cases.get((case["puzzle"], case["mode"]))
+        if old_case is None or "error" in old_case:
+            continue
+        if "error" in case:
+            regressions.append(
+                f"{case['puzzle']} {case['mode']}: {case['error']}"
+            )
+            continue
+        for metric in REGRESSION_METRICS:
+            old, new = old_case[metric], case[metric]
+            if new - old <= MIN_DIFFERENCES.get(metric, 0):
+                continue
+            if new > old * (1 + threshold):
+                regressions.append(
+                    f"{case['puzzle']} {case['mode']}: {metric} went from "
+                    f"{old:.4g} to {new:.4g}"
+                )
+    return regressions
+
+
+def print_case(case: dict) -> None:
+    if "error" in case:
+        print(f"{case['puzzle']:<26} {case['mode']:<12} {case['error']}")
+        return
+    print(
+        f"{case['puzzle']:<26} {case['mode']:<12} "
+        f"{case['solutions']:>6} solutions "
+        f"build {case['build_seconds']:7.3f}s "
+        f"solve {case['solve_seconds']:8.3f}s "
+        f"{case['search_nodes']:>8} nodes "
+        f"{case['nodes_per_second']:9.1f} nodes/s "
+        f"{case['propagation_passes']:>9} passes "
+        f"{case['peak_rss_mb']:7.1f}MB"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--case", nargs=2, metavar=("PUZZLE", "MODE"), help=argparse.SUPPRESS
+    )
+    parser.add_argument("--puzzles", nargs="+", default=PUZZLES)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--output", help="JSON file to write the results to.")
+    parser.add_argument("--baseline", help="JSON results to compare against.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Relative increase in a metric that counts as a regression.",
+    )
+    parser.add_argument(
+        "--timeout", type=float, help="Seconds allowed for each case."
+    )
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(*args.case)))
+        return 0
+
+    results = []
+    for name in args.puzzles:
+        for mode in args.modes:
+            case = run_case_in_subprocess(name, mode, args.timeout)
+            print_case(case)
+            results.append(case)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = find_regressions(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from sudoku.solutions import NUM_CELLS, NUM_DIGITS, possibles_to_digits
+
+if TYPE_CHECKING:
+    from sudoku.puzzle import Puzzle
+
+# Most search states propagated together.
+DEFAULT_BATCH_SIZE = 1024
+
+
+class BatchSolver:
+    """Search many grids with the rules of one puzzle at once.
+
+    Search states are the rows of 2D possibles and finalised arrays. They can
+    come from different grids, such as different givens, or from different
+    branches of one grid. Contradiction elimination and singleton coverees
+    are applied to a whole batch of states with a few matrix products, so
+    interpreter overhead is shared between them.
+
+    Constraints that act during the solve aren't supported, and deduction
+    stages aren't used.
+    """
+
+    def __init__(self, puzzle: Puzzle, batch_size: int = DEFAULT_BATCH_SIZE):
+        if any(len(c.watched_indices()) for c in puzzle.constraints):
+            raise ValueError(
+                "Batches can't be solved with constraints that act during "
+                "the solve."
+            )
+        if batch_size < 1:
+            raise ValueError(f"Batch size must be positive, got {batch_size}.")
+        self.batch_size = batch_size
+        self.possibles = puzzle.possibles.copy()
+        self.finalised = puzzle.finalised.copy()
+        self.coverees = puzzle.coverees
+        self._adjacency = puzzle.contradictions.to_dense().astype(np.float32)
+        incidence = np.zeros(
+            (len(self.possibles), len(self.coverees)), dtype=np.float32
+        )
+        incidence[self.coverees, np.arange(len(self.coverees))[:, None]] = 1
+        # Padding refers to the always impossible last possible.
+        incidence[-1] = 0
+        self._incidence = incidence
+
+    def grids_from_givens(self, givens: np.ndarray) -> np.ndarray:
+        """Possibles arrays for grids of 81 givens each, 0 for none."""
+        givens = np.asarray(givens, dtype=np.intp).reshape(-1, NUM_CELLS)
+        allowed = np.ones(givens.shape + (NUM_DIGITS,), dtype=bool)
+        given = givens > 0
+        allowed[given] = (
+            np.arange(1, NUM_DIGITS + 1) == givens[given][:, np.newaxis]
+        )
+        possibles = np.repeat(self.possibles[np.newaxis], len(givens), axis=0)
+        possibles[:, :-1] &= allowed.reshape(len(givens), -1)
+        return possibles
+
+    def iter_solutions(
+        self, possibles: np.ndarray, limit: int | None = None
+    ) -> Iterator[tuple[int, np.ndarray]]:
+        """Yield (grid number, 81 digits) for each solution of each grid.
+
+        Grids are possibles arrays, as rows of a 2D array. Stops searching a
+        grid once it has `limit` solutions, if given.
+        """
+        if limit is not None and limit < 1:
+            raise ValueError(f"Solution limit must be positive, got {limit}.")
+        possibles = np.array(possibles, dtype=bool, ndmin=2)
+        finalised = possibles & self.finalised
+        num_found = np.zeros(len(possibles), dtype=int)
+        # Each entry is (possibles, finalised, newly finalised, grid numbers).
+        stack = [
+            (possibles, finalised, finalised.copy(), np.arange(len(possibles)))
+        ]
+
+        while stack:
+            possibles, finalised, pending, grids = stack.pop()
+            if len(grids) > self.batch_size:
+                stack.append(
+                    tuple(
+                        array[self.batch_size :]
+                        for array in (possibles, finalised, pending, grids)
+                    )
+                )
+                possibles, finalised, pending, grids = (
+                    array[: self.batch_size]
+                    for array in (possibles, finalised, pending, grids)
+                )
+            if limit is not None:
+                wanted = num_found[grids] < limit
+                possibles, finalised, pending, grids = (
+                    array[wanted]
+                    for array in (possibles, finalised, pending, grids)
+                )
+            if not len(grids):
+                continue
+
+            alive = self._propagate(possibles, finalised, pending)
+            solved = alive & (finalised.sum(axis=1) == NUM_CELLS)
+            for grid, digits in zip(
+                grids[solved].tolist(), possibles_to_digits(possibles[solved])
+            ):
+                if limit is None or num_found[grid] < limit:
+                    num_found[grid] += 1
+                    yield grid, digits
+
+            open_states = alive & ~solved
+            stack.extend(
+                self._branch(
+                    possibles[open_states],
+                    finalised[open_states],
+                    grids[open_states],
+                )
+            )
+
+    def count_solutions(
+        self, possibles: np.ndarray, limit: int | None = None
+    ) -> np.ndarray:
+        """The number of solutions of each grid, up to `limit` if given."""
+        possibles = np.array(possibles, dtype=bool, ndmin=2)
+        counts = np.zeros(len(possibles), dtype=int)
+        for grid, _ in self.iter_solutions(possibles, limit):
+            counts[grid] += 1
+        return counts
+
+    def _propagate(
+        self, possibles: np.ndarray, finalised: np.ndarray, pending: np.ndarray
+    ) -> np.ndarray:
+        """Propagate states in place, returning which are still consistent.
+
+        `pending` marks finalised possibles whose contradictions haven't been
+        removed yet.
+        """
+        alive = np.ones(len(possibles), dtype=bool)
+        while True:
+            if pending.any():
+                removed = pending.astype(np.float32) @ self._adjacency > 0
+                alive &= ~np.any(removed & finalised, axis=1)
+                possibles &= ~removed
+
+            counts = possibles.astype(np.float32) @ self._incidence
+            alive &= np.all(counts > 0, axis=1)
+            singletons = (counts == 1) & alive[:, np.newaxis]
+            forced = (
+                singletons.astype(np.float32) @ self._incidence.T > 0
+            ) & possibles
+            forced &= ~finalised
+            if not forced.any():
+                return alive
+            finalised |= forced
+            pending = forced
+
+    def _branch(
+        self, possibles: np.ndarray, finalised: np.ndarray, grids: np.ndarray
+    ) -> list[tuple]:
+        """Split each state on the options of its smallest open coveree.
+
+        Each option's branch also excludes the options before it, so the
+        branches don't overlap.
+        """
+        if not len(grids):
+            return []
+        counts = possibles.astype(np.float32) @ self._incidence
+        is_open = (finalised.astype(np.float32) @ self._incidence == 0) & (
+            counts >= 2
+        )
+        chosen = np.argmin(np.where(is_open, counts, np.inf), axis=1)
+        options = self.coverees[chosen]
+        valid = possibles[np.arange(len(grids))[:, np.newaxis], options]
+
+        branches = []
+        for slot in reversed(range(options.shape[1])):
+            rows = np.flatnonzero(valid[:, slot])
+            if not len(rows):
+                continue
+            child_possibles = possibles[rows].copy()
+            child_finalised = finalised[rows].copy()
+            earlier = valid[rows, :slot]
+            child_possibles[
+                np.nonzero(earlier)[0], options[rows, :slot][earlier]
+            ] = False
+            child_finalised[np.arange(len(rows)), options[rows, slot]] = True
+            pending = np.zeros_like(child_finalised)
+            pending[np.arange(len(rows)), options[rows, slot]] = True
+            branches.append(
+                (child_possibles, child_finalised, pending, grids[rows])
+            )
+        return branches
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import functools
 import itertools
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING
@@ -12,6 +13,8 @@ if TYPE_CHECKING:
     from .puzzle import DIGITS, Puzzle
 
 DIGITS = list(range(1, 10))
+# Bit d - 1 stands for digit d in masks of digits.
+DIGIT_BITS = 1 << np.arange(9)
 
 
 class Constraint(ABC):
@@ -19,7 +22,7 @@ class Constraint(ABC):
     def __init__(self, puzzle: Puzzle, cells: list[tuple]):
         self.puzzle = puzzle
         self.cells = np.array(cells)
-        puzzle.constraints.append(self)
+        puzzle.add_constraint(self)
         self.add_contradictions()
         self.initialise_on_grid()
 
@@ -37,19 +40,47 @@ class Constraint(ABC):
         """
         Update the grid's possibles and finalised state.
 
-        Called periodically thoughout the solve.
+        Called thoughout the solve whenever one of the watched indices changes.
         """
         pass
 
+    def add_cell_pair_contradictions(
+        self,
+        cells_1: np.ndarray,
+        cells_2: np.ndarray,
+        digits_1: np.ndarray,
+        digits_2: np.ndarray,
+    ) -> None:
+        """Contradict pairs of digits in pairs of cells, in bulk.
+
+        For every j and k, digit `digits_1[k]` in cell `cells_1[j]` contradicts
+        digit `digits_2[k]` in cell `cells_2[j]`.
+        """
+        cells_1 = np.asarray(cells_1).reshape(-1, 2)
+        cells_2 = np.asarray(cells_2).reshape(-1, 2)
+        self.puzzle.add_contradictions_bulk(
+            self.puzzle.possible_index(
+                cells_1[:, :1], cells_1[:, 1:], np.asarray(digits_1)
+            ),
+            self.puzzle.possible_index(
+                cells_2[:, :1], cells_2[:, 1:], np.asarray(digits_2)
+            ),
+        )
+
+    def watched_indices(self) -> np.ndarray:
+        """Possible indices whose changes should trigger `act_on_grid`."""
+        if type(self).act_on_grid is Constraint.act_on_grid:
+            return np.array([], dtype=int)
+        return self.puzzle.get_indices_for_cells(self.cells).reshape(-1)
+
 
 class NoRepeatsConstraint(Constraint):
 
     def add_contradictions(self) -> None:
-        for c1, c2 in itertools.combinations(self.cells, 2):
-            for value in DIGITS:
-                i1 = self.puzzle.possible_index(*c1, value)
-                i2 = self.puzzle.possible_index(*c2, value)
-                self.puzzle.add_contradiction(i1, i2)
+        first, second = np.triu_indices(len(self.cells), k=1)
+        self.add_cell_pair_contradictions(
+            self.cells[first], self.cells[second], DIGITS, DIGITS
+        )
 
     def initialise_on_grid(self) -> None:
         pass
@@ -73,7 +104,6 @@ class Box(NoRepeatsConstraint):
         rows = [((box - 1) // 3) * 3 + i + 1 for i in range(3)]
         cols = [((box - 1) % 3) * 3 + i + 1 for i in range(3)]
         super().__init__(puzzle, [(i, j) for i in rows for j in cols])
-        super().__init__(puzzle, [(i, j) for i in rows for j in cols])
 
 
 class GermanWhisper(Constraint):
@@ -85,12 +115,10 @@ class GermanWhisper(Constraint):
         self.puzzle.possibles[indices] = False
 
     def add_contradictions(self) -> None:
-        for (r1, c1), (r2, c2) in zip(self.cells[:-1], self.cells[1:]):
-            for d1, d2 in itertools.product(DIGITS, repeat=2):
-                if abs(d1 - d2) < 5:
-                    i1 = self.puzzle.possible_index(r1, c1, d1)
-                    i2 = self.puzzle.possible_index(r2, c2, d2)
-                    self.puzzle.add_contradiction(i1, i2)
+        d1, d2 = np.nonzero(np.abs(np.subtract.outer(DIGITS, DIGITS)) < 5)
+        self.add_cell_pair_contradictions(
+            self.cells[:-1], self.cells[1:], d1 + 1, d2 + 1
+        )
 
 
 class NoX(Constraint):
@@ -104,39 +132,17 @@ class NoX(Constraint):
         pass
 
     def add_contradictions(self) -> None:
-        for low_summand in range(1, 5):
-            for col in DIGITS:
-                for row in DIGITS:
-                    # Right side of cell
-                    if col != max(DIGITS):
-                        i1 = self.puzzle.possible_index(row, col, low_summand)
-                        i2 = self.puzzle.possible_index(
-                            row, col + 1, 10 - low_summand
-                        )
-                        self.puzzle.add_contradiction(i1, i2)
-
-                        i1 = self.puzzle.possible_index(
-                            row, col, 10 - low_summand
-                        )
-                        i2 = self.puzzle.possible_index(
-                            row, col + 1, low_summand
-                        )
-                        self.puzzle.add_contradiction(i1, i2)
-
-                    if row < max(DIGITS):
-                        i1 = self.puzzle.possible_index(row, col, low_summand)
-                        i2 = self.puzzle.possible_index(
-                            row + 1, col, 10 - low_summand
-                        )
-                        self.puzzle.add_contradiction(i1, i2)
-
-                        i1 = self.puzzle.possible_index(
-                            row, col, 10 - low_summand
-                        )
-                        i2 = self.puzzle.possible_index(
-                            row + 1, col, low_summand
-                        )
-                        self.puzzle.add_contradiction(i1, i2)
+        low_summands = np.arange(1, 5)
+        summands = np.concatenate([low_summands, 10 - low_summands])
+        cells = self.cells.reshape(9, 9, 2)
+        # Pairs of cells next to each other, to the right and then below.
+        for cells_1, cells_2 in [
+            (cells[:, :-1], cells[:, 1:]),
+            (cells[:-1, :], cells[1:, :]),
+        ]:
+            self.add_cell_pair_contradictions(
+                cells_1, cells_2, summands, 10 - summands
+            )
 
 
 class RegionCountConstraint(Constraint):
@@ -144,6 +150,10 @@ class RegionCountConstraint(Constraint):
         self, puzzle: Puzzle, cells: list[tuple[int]], counts: dict[int, int]
     ):
         self.counts_array = np.array([counts.get(i, 0) for i in DIGITS])
+        # The cells left over once every other digit has its full count.
+        self.minimum_counts = np.maximum(
+            len(cells) - (self.counts_array.sum() - self.counts_array), 0
+        )
         self.indices = puzzle.get_indices_for_cells(cells)
         super().__init__(puzzle, cells)
 
@@ -163,10 +173,26 @@ class RegionCountConstraint(Constraint):
         pass
 
     def act_on_grid(self) -> None:
+        """Remove digits that have reached their count from the rest of the
+        region, and finalise digits with only their minimum count left."""
+        possibles = self.puzzle.possibles[self.indices]
         finalised = self.puzzle.finalised[self.indices]
-        counts = finalised.sum(axis=0)
-        if np.any(counts > self.counts_array):
+        finalised_counts = finalised.sum(axis=0)
+        if np.any(finalised_counts > self.counts_array):
             raise SudokuContradiction("Specified region count exceeded!")
+        possible_counts = possibles.sum(axis=0)
+        if np.any(possible_counts < self.minimum_counts):
+            raise SudokuContradiction("Specified region count unreachable!")
+
+        saturated = finalised_counts == self.counts_array
+        removed = possibles & ~finalised & saturated
+        if np.any(removed):
+            self.puzzle.remove_possibles(self.indices[removed])
+        forced = (possible_counts == self.minimum_counts) & (
+            finalised_counts < possible_counts
+        )
+        if np.any(forced):
+            self.puzzle.finalise(self.indices[possibles & forced])
 
 
 class CountingCircles(Constraint):
@@ -180,26 +206,23 @@ class CountingCircles(Constraint):
         pass
 
     def add_contradictions(self) -> None:
-        tuple_cells = [tuple(row) for row in self.cells]
-        for c1 in tuple_cells:
-            for c2 in tuple_cells:
-                if np.all(c1 == c2):
-                    continue
-
-                i1 = self.puzzle.possible_index(*c1, 1)
-                i2 = self.puzzle.possible_index(*c2, 1)
-                self.puzzle.add_contradiction(i1, i2)
-
-        for c1 in tuple_cells:
-            for c2 in itertools.product(range(1, 10), repeat=2):
-                if c2 in tuple_cells:
-                    continue
+        first, second = np.nonzero(~np.eye(len(self.cells), dtype=bool))
+        self.add_cell_pair_contradictions(
+            self.cells[first], self.cells[second], [1], [1]
+        )
 
-                i1 = self.puzzle.possible_index(*c1, 9)
-                i2 = self.puzzle.possible_index(*c2, 9)
-                self.puzzle.add_contradiction(i1, i2)
+        in_circle = np.zeros((10, 10), dtype=bool)
+        in_circle[self.cells[:, 0], self.cells[:, 1]] = True
+        outside_cells = np.argwhere(~in_circle[1:, 1:]) + 1
+        first, second = np.indices((len(self.cells), len(outside_cells)))
+        self.add_cell_pair_contradictions(
+            self.cells[first], outside_cells[second], [9], [9]
+        )
 
     def act_on_grid(self) -> None:
+        """Remove digits that can't be in circles as many times as their
+        value, or already are, and finalise every circle left for a digit
+        that has to fill them."""
         finalised = self.puzzle.finalised[self.indices]
         finalised_counts = finalised.sum(axis=0)
         if np.any(finalised_counts > self.target_counts_array):
@@ -207,14 +230,24 @@ class CountingCircles(Constraint):
 
         possibles = self.puzzle.possibles[self.indices]
         possible_counts = possibles.sum(axis=0)
-        if np.any(
-            (possible_counts < self.target_counts_array)
-            * (finalised_counts != 0)
-        ):
+        too_few = possible_counts < self.target_counts_array
+        if np.any(too_few * (finalised_counts != 0)):
             raise SudokuContradiction(
                 "Not enough possibles to satisfy circles."
             )
 
+        ruled_out = too_few | (finalised_counts == self.target_counts_array)
+        removed = possibles & ~finalised & ruled_out
+        if np.any(removed):
+            self.puzzle.remove_possibles(self.indices[removed])
+        forced = (
+            (finalised_counts != 0)
+            & (possible_counts == self.target_counts_array)
+            & (finalised_counts < possible_counts)
+        )
+        if np.any(forced):
+            self.puzzle.finalise(self.indices[possibles & forced])
+
 
 class KillerCage(NoRepeatsConstraint):
 
@@ -222,29 +255,42 @@ class KillerCage(NoRepeatsConstraint):
         super().__init__(puzzle, cells)
         self.indices = puzzle.get_indices_for_cells(self.cells)
         self.total = total
+        self.combinations = cage_combinations(len(self.cells), total)
 
     def act_on_grid(self) -> None:
+        """Remove digits that aren't in any combination still able to fill
+        the cage."""
         possibles = self.puzzle.possibles[self.indices]
-        combined_possibles = np.sum(possibles, axis=0) > 0
-        values = combined_possibles * np.arange(1, 10)
-
-        cumsum = np.unique(np.cumsum(values))
-
-        if cumsum[0] == 0:
-            cumsum = cumsum[1:]
-
-        num_unique_possibles = len(cumsum)
-        if num_unique_possibles < len(self.cells):
-            raise SudokuContradiction("Not enough possibles left to fill cage.")
-
-        if cumsum[len(self.cells) - 1] > self.total:
-            raise SudokuContradiction("Minimum cage total too big.")
-
-        starting_cumsum = 0
-        if len(self.cells) < len(cumsum):
-            starting_cumsum = cumsum[-len(self.cells) - 1]
-        if cumsum[-1] - starting_cumsum < self.total:
-            raise SudokuContradiction("Maximum cage total too small.")
+        cell_masks = possibles @ DIGIT_BITS
+        # Every digit of a combination needs a cell, and every cell a digit.
+        fits = (self.combinations & ~np.bitwise_or.reduce(cell_masks)) == 0
+        fits &= np.all(
+            self.combinations[:, np.newaxis] & cell_masks != 0, axis=1
+        )
+        if not np.any(fits):
+            raise SudokuContradiction("No combination left to fill cage.")
+        allowed = np.bitwise_or.reduce(self.combinations[fits])
+        ruled_out = possibles & (allowed & DIGIT_BITS == 0)
+        if np.any(ruled_out):
+            self.puzzle.remove_possibles(self.indices[ruled_out])
+
+
+@functools.cache
+def cage_combinations(size: int, total: int) -> np.ndarray:
+    """Masks of the sets of `size` different digits adding up to `total`.
+
+    Cached, so cages of the same size and total share them.
+    """
+    combinations = np.array(
+        [
+            sum(1 << (digit - 1) for digit in combination)
+            for combination in itertools.combinations(DIGITS, size)
+            if sum(combination) == total
+        ],
+        dtype=np.int64,
+    )
+    combinations.flags.writeable = False
+    return combinations
 
 
 class CornerMark(Constraint):
@@ -292,6 +338,7 @@ class Wheel(Constraint):
         self.puzzle.possibles[possibles_to_remove] = False
 
     def add_contradictions(self) -> None:
+        i1, i2 = [], []
         for value_idx_1, value_idx_2 in itertools.combinations(range(4), 2):
             expected_diff = (value_idx_2 - value_idx_1) % 4
             for cell_idx_1, cell_idx_2 in itertools.product(range(4), repeat=2):
@@ -300,13 +347,17 @@ class Wheel(Constraint):
                 actual_diff = (cell_idx_2 - cell_idx_1) % 4
 
                 if actual_diff != expected_diff:
-                    i1 = self.puzzle.possible_index(
-                        *self.cells[cell_idx_1], self.values[value_idx_1]
+                    i1.append(
+                        self.puzzle.possible_index(
+                            *self.cells[cell_idx_1], self.values[value_idx_1]
+                        )
                     )
-                    i2 = self.puzzle.possible_index(
-                        *self.cells[cell_idx_2], self.values[value_idx_2]
+                    i2.append(
+                        self.puzzle.possible_index(
+                            *self.cells[cell_idx_2], self.values[value_idx_2]
+                        )
                     )
-                    self.puzzle.add_contradiction(i1, i2)
+        self.puzzle.add_contradictions_bulk(i1, i2)
 
 
 class AntiKing(Constraint):
@@ -321,15 +372,11 @@ class AntiKing(Constraint):
         pass
 
     def add_contradictions(self) -> None:
-        for r1, c1 in self.cells:
-            for r2, c2 in self.cells:
-                if r1 == r2 or c1 == c2:
-                    continue
-                if abs(r1 - r2) == 1 and abs(c1 - c2) == 1:
-                    for value in range(1, 10):
-                        i1 = self.puzzle.possible_index(r1, c1, value)
-                        i2 = self.puzzle.possible_index(r2, c2, value)
-                        self.puzzle.add_contradiction(i1, i2)
+        offsets = np.abs(self.cells[:, np.newaxis] - self.cells[np.newaxis])
+        first, second = np.nonzero(np.all(offsets == 1, axis=-1))
+        self.add_cell_pair_contradictions(
+            self.cells[first], self.cells[second], DIGITS, DIGITS
+        )
 
 
 class DiagonalNoBlackKropki(Constraint):
@@ -341,14 +388,13 @@ class DiagonalNoBlackKropki(Constraint):
         )
 
     def add_contradictions(self) -> None:
-        for r1, c1 in self.cells:
-            for r2, c2 in self.cells:
-                if abs(r1 - r2) <= 1 and abs(c1 - c2) <= 1:
-                    for v1, v2 in itertools.product(range(1, 10), repeat=2):
-                        i1 = self.puzzle.possible_index(r1, c1, v1)
-                        i2 = self.puzzle.possible_index(r2, c2, v2)
-                        if v1 + v2 == 8:
-                            self.puzzle.add_contradiction(i1, i2)
+        # Includes each cell paired with itself, which rules out a 4 in it.
+        offsets = np.abs(self.cells[:, np.newaxis] - self.cells[np.newaxis])
+        first, second = np.nonzero(np.all(offsets <= 1, axis=-1))
+        values = np.arange(1, 8)
+        self.add_cell_pair_contradictions(
+            self.cells[first], self.cells[second], values, 8 - values
+        )
 
     def initialise_on_grid(self) -> None:
         pass
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+def split_rows(indptr: np.ndarray, indices: np.ndarray) -> list[np.ndarray]:
+    """Split CSR column indices into one array (view) per row."""
+    return np.split(indices, indptr[1:-1])
+
+
+def gather_rows(row_arrays: list[np.ndarray], rows) -> np.ndarray:
+    """Concatenate the given rows of a CSR structure split by `split_rows`.
+
+    Concatenating per-row views is much cheaper than a vectorised gather for
+    the handful of rows touched by a single change.
+    """
+    rows = rows.tolist() if isinstance(rows, np.ndarray) else list(rows)
+    if len(rows) == 1:
+        return row_arrays[rows[0]]
+    if not rows:
+        return row_arrays[-1][:0]
+    return np.concatenate([row_arrays[row] for row in rows])
+
+
+def build_csr(
+    rows: np.ndarray, cols: np.ndarray, num_rows: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Build CSR arrays from (row, col) pairs."""
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(num_rows + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=num_rows), out=indptr[1:])
+    return indptr, cols[order].astype(np.int32)
+
+
+class ContradictionGraph:
+    """Symmetric contradiction graph between possibles, stored as CSR.
+
+    Contradictions are buffered as they are added and compiled into CSR
+    adjacency arrays the first time the graph is queried. Adding more
+    contradictions after that is allowed; the graph is rebuilt lazily on the
+    next query.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._pending_i1 = []
+        self._pending_i2 = []
+        # Arrays of contradictions added in bulk, as (i1, i2) pairs.
+        self._pending_arrays = []
+        self._indptr = np.zeros(size + 1, dtype=np.int32)
+        self._indices = np.zeros(0, dtype=np.int16)
+        # Per-row views of `_indices`, split when first needed.
+        self._row_arrays = None
+        # Adjacency matrix with rows packed into bits, built when first needed.
+        self._packed_rows = None
+
+    @classmethod
+    def from_csr(
+        cls, indptr: np.ndarray, indices: np.ndarray
+    ) -> ContradictionGraph:
+        """Wrap existing CSR arrays without copying them."""
+        graph = cls(len(indptr) - 1)
+        graph._indptr = indptr
+        graph._indices = indices
+        return graph
+
+    def copy(self) -> ContradictionGraph:
+        """Copy the graph, sharing the compiled arrays with this one."""
+        self.freeze()
+        graph = ContradictionGraph.from_csr(self._indptr, self._indices)
+        graph._row_arrays = self._row_arrays
+        graph._packed_rows = self._packed_rows
+        return graph
+
+    def add(self, i1: int, i2: int) -> None:
+        self._pending_i1.append(i1)
+        self._pending_i2.append(i2)
+
+    def add_many(self, i1: np.ndarray, i2: np.ndarray) -> None:
+        """Add a contradiction between each pair of entries of the arrays."""
+        self._pending_arrays.append(
+            (np.asarray(i1, dtype=np.int64), np.asarray(i2, dtype=np.int64))
+        )
+
+    @property
+    def is_frozen(self) -> bool:
+        return not self._pending_i1 and not self._pending_arrays
+
+    def freeze(self) -> None:
+        """Compile any pending contradictions into the CSR arrays."""
+        if self.is_frozen:
+            return
+        i1 = np.concatenate(
+            [np.array(self._pending_i1, dtype=np.int64)]
+            + [i1 for i1, _ in self._pending_arrays]
+        )
+        i2 = np.concatenate(
+            [np.array(self._pending_i2, dtype=np.int64)]
+            + [i2 for _, i2 in self._pending_arrays]
+        )
+        self._pending_i1 = []
+        self._pending_i2 = []
+        self._pending_arrays = []
+
+        existing_rows = np.repeat(
+            np.arange(self.size, dtype=np.int64), np.diff(self._indptr)
+        )
+        keys = np.unique(
+            np.concatenate(
+                [
+                    existing_rows * self.size + self._indices,
+                    i1 * self.size + i2,
+                    i2 * self.size + i1,
+                ]
+            )
+        )
+        rows = keys // self.size
+        self._indptr = np.zeros(self.size + 1, dtype=np.int32)
+        np.cumsum(np.bincount(rows, minlength=self.size), out=self._indptr[1:])
+        self._indices = (keys % self.size).astype(np.int16)
+        self._row_arrays = None
+        self._packed_rows = None
+
+    @property
+    def indptr(self) -> np.ndarray:
+        self.freeze()
+        return self._indptr
+
+    @property
+    def indices(self) -> np.ndarray:
+        self.freeze()
+        return self._indices
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    def neighbours(self, possible_indices) -> np.ndarray:
+        """Return every possible contradicting any of the given ones."""
+        self.freeze()
+        if self._row_arrays is None:
+            self._row_arrays = split_rows(self._indptr, self._indices)
+        return gather_rows(self._row_arrays, possible_indices)
+
+    def neighbour_counts(self, mask: np.ndarray) -> np.ndarray:
+        """For every possible, count its neighbours that are set in `mask`."""
+        indptr = self.indptr
+        counts = np.zeros(self.size, dtype=np.int64)
+        if not len(self._indices):
+            return counts
+        non_empty = indptr[:-1] < indptr[1:]
+        counts[non_empty] = np.add.reduceat(
+            mask[self._indices], indptr[:-1][non_empty], dtype=np.int64
+        )
+        return counts
+
+    def packed_rows(self) -> np.ndarray:
+        """The adjacency matrix, with each row packed into bits."""
+        self.freeze()
+        if self._packed_rows is None:
+            self._packed_rows = np.packbits(self.to_dense(), axis=1)
+        return self._packed_rows
+
+    def to_dense(self) -> np.ndarray:
+        rows = np.repeat(np.arange(self.size), np.diff(self.indptr))
+        dense = np.zeros((self.size, self.size), dtype=bool)
+        dense[rows, self._indices] = True
+        return dense
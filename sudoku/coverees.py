@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import numpy as np
+
+# Fills the unused end of each row. As a possible index it refers to the
+# always-impossible last entry of `Puzzle.possibles`.
+PADDING = -1
+# Width of the array before any longer coveree is added.
+DEFAULT_WIDTH = 9
+MIN_CAPACITY = 64
+
+
+class CovereeStore:
+    """Coverees, stored as the rows of a growable 2D array padded with -1.
+
+    Appending is amortised O(1). The buffer doubles its rows when full and
+    widens when a longer coveree is added. Copies share the buffer until they
+    append to it.
+    """
+
+    def __init__(self, width: int = DEFAULT_WIDTH):
+        self._buffer = np.full((0, width), PADDING, dtype=np.intp)
+        self._size = 0
+        self._owns_buffer = True
+
+    @classmethod
+    def from_array(cls, array: np.ndarray) -> CovereeStore:
+        """Wrap a padded 2D array of coverees without copying it."""
+        store = cls.__new__(cls)
+        store._buffer = array
+        store._size = len(array)
+        store._owns_buffer = False
+        return store
+
+    def copy(self) -> CovereeStore:
+        store = CovereeStore.from_array(self._buffer)
+        store._size = self._size
+        return store
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def array(self) -> np.ndarray:
+        """The coverees as a (num_coverees, width) array."""
+        return self._buffer[: self._size]
+
+    def append(self, coveree: list[int]) -> None:
+        coveree = np.asarray(coveree, dtype=np.intp)
+        capacity, width = self._buffer.shape
+        if (
+            not self._owns_buffer
+            or self._size == capacity
+            or len(coveree) > width
+        ):
+            if self._size == capacity:
+                capacity = max(2 * capacity, MIN_CAPACITY)
+            self._reallocate(capacity, max(width, len(coveree)))
+
+        row = self._buffer[self._size]
+        row[: len(coveree)] = coveree
+        row[len(coveree) :] = PADDING
+        self._size += 1
+
+    def _reallocate(self, capacity: int, width: int) -> None:
+        buffer = np.full((capacity, width), PADDING, dtype=np.intp)
+        buffer[: self._size, : self._buffer.shape[1]] = self.array
+        self._buffer = buffer
+        self._owns_buffer = True
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+
+
+class DancingLinks:
+    """Knuth's Algorithm X, with the dancing links kept in flat lists.
+
+    Primary columns must be covered exactly once and secondary columns at
+    most once. Node 0 is the root, nodes 1 to the number of columns are the
+    column headers, and the rest are the 1s of the rows. Covering and
+    uncovering a column costs O(1) per link.
+    """
+
+    def __init__(
+        self,
+        num_primary: int,
+        num_secondary: int,
+        rows: Iterable[Iterable[int]],
+    ):
+        size = num_primary + num_secondary + 1
+        self._left = [node - 1 for node in range(size)]
+        self._right = [node + 1 for node in range(size)]
+        # Only primary columns need covering, so only they are in the header
+        # list. Secondary headers link to themselves.
+        self._left[0] = num_primary
+        self._right[num_primary] = 0
+        for header in range(num_primary + 1, size):
+            self._left[header] = self._right[header] = header
+        self._up = list(range(size))
+        self._down = list(range(size))
+        self._column = list(range(size))
+        self._row = [-1] * size
+        self._sizes = [0] * size
+        # The first node of each row, or None for empty rows.
+        self._row_starts = []
+        # Headers of the columns covered by `select`.
+        self._selected = set()
+        for columns in rows:
+            self._add_row(columns)
+
+    def _add_row(self, columns: Iterable[int]) -> None:
+        row = len(self._row_starts)
+        first = None
+        for column in columns:
+            header = column + 1
+            node = len(self._up)
+            self._up.append(self._up[header])
+            self._down.append(header)
+            self._down[self._up[header]] = node
+            self._up[header] = node
+            self._column.append(header)
+            self._row.append(row)
+            self._sizes[header] += 1
+            if first is None:
+                first = node
+                self._left.append(node)
+                self._right.append(node)
+            else:
+                last = self._left[first]
+                self._left.append(last)
+                self._right.append(first)
+                self._right[last] = node
+                self._left[first] = node
+        self._row_starts.append(first)
+
+    def select(self, row: int) -> bool:
+        """Put a row in every solution. Returns False if it clashes with a
+        row already selected."""
+        first = self._row_starts[row]
+        if first is None:
+            return True
+        headers = [self._column[first]]
+        node = self._right[first]
+        while node != first:
+            headers.append(self._column[node])
+            node = self._right[node]
+        if self._selected.intersection(headers):
+            return False
+        self._selected.update(headers)
+        for header in headers:
+            self._cover(header)
+        return True
+
+    def _cover(self, header: int) -> None:
+        left, right, up, down = self._left, self._right, self._up, self._down
+        column, sizes = self._column, self._sizes
+        right[left[header]] = right[header]
+        left[right[header]] = left[header]
+        row_node = down[header]
+        while row_node != header:
+            node = right[row_node]
+            while node != row_node:
+                down[up[node]] = down[node]
+                up[down[node]] = up[node]
+                sizes[column[node]] -= 1
+                node = right[node]
+            row_node = down[row_node]
+
+    def _uncover(self, header: int) -> None:
+        left, right, up, down = self._left, self._right, self._up, self._down
+        column, sizes = self._column, self._sizes
+        row_node = up[header]
+        while row_node != header:
+            node = left[row_node]
+            while node != row_node:
+                sizes[column[node]] += 1
+                down[up[node]] = node
+                up[down[node]] = node
+                node = left[node]
+            row_node = up[row_node]
+        right[left[header]] = header
+        left[right[header]] = header
+
+    def solutions(self) -> Iterator[list[int]]:
+        """Yield the rows of each solution, besides the selected ones.
+
+        The structure is restored once the iteration finishes.
+        """
+        yield from self._search([])
+
+    def _search(self, chosen: list[int]) -> Iterator[list[int]]:
+        right, down, sizes = self._right, self._down, self._sizes
+        if right[0] == 0:
+            yield list(chosen)
+            return
+
+        # Branch on the column with fewest rows left.
+        header = right[0]
+        best = header
+        while header != 0:
+            if sizes[header] < sizes[best]:
+                best = header
+                if not sizes[best]:
+                    return
+            header = right[header]
+        if not sizes[best]:
+            return
+
+        self._cover(best)
+        row_node = down[best]
+        while row_node != best:
+            chosen.append(self._row[row_node])
+            node = right[row_node]
+            while node != row_node:
+                self._cover(self._column[node])
+                node = right[node]
+            yield from self._search(chosen)
+            node = self._left[row_node]
+            while node != row_node:
+                self._uncover(self._column[node])
+                node = self._left[node]
+            chosen.pop()
+            row_node = down[row_node]
+        self._uncover(best)
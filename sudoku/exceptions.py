@@ -1,2 +1,13 @@
+from __future__ import annotations
+
+
 class SudokuContradiction(Exception):
-    """Raised to indicate a contradiction in a puzzle."""
+    """Raised to indicate a contradiction in a puzzle.
+
+    `levels` is a bit mask of the bifurcation levels whose choices led to it,
+    or None if unknown.
+    """
+
+    def __init__(self, message: str = "", levels: int | None = None):
+        super().__init__(message)
+        self.levels = levels
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import collections
+from collections.abc import Hashable
+from typing import Any
+
+
+class LRUCache:
+    """A mapping of at most `capacity` items, evicting the least recently
+    used one when full.
+
+    Only `get`, `put` and `touch` count as using an item.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError(f"Capacity must be positive, got {capacity}.")
+        self.capacity = capacity
+        self._items = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def __getitem__(self, key: Hashable) -> Any:
+        return self._items[key]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if key not in self._items:
+            return default
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key: Hashable, value: Any) -> tuple | None:
+        """Add or replace an item. Returns the evicted (key, value), if any."""
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.capacity:
+            return self._items.popitem(last=False)
+        return None
+
+    def touch(self, key: Hashable) -> None:
+        self._items.move_to_end(key)
+
+    def clear(self) -> None:
+        self._items.clear()
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import collections
+from collections.abc import Iterator
+
+NUM_DIGITS = 9
+ALL_DIGITS = (1 << NUM_DIGITS) - 1
+# Number of digits in each mask.
+POPCOUNTS = [bin(mask).count("1") for mask in range(ALL_DIGITS + 1)]
+
+# A puzzle's rules in terms of per-cell digit masks, where bit d - 1 stands
+# for digit d.
+#   eliminations: for each cell and digit (0-8), the (cell, mask) pairs of
+#       digits that placing it rules out elsewhere.
+#   digit_groups: (cells, digits) pairs, where each of the digits must be in
+#       at least one of the cells. A house is a group of all 9 digits.
+#   mixed_coverees: other coverees, as (cell, mask) pairs with one pair per
+#       cell, of which at least one must hold.
+MaskModel = collections.namedtuple(
+    "MaskModel", ["eliminations", "digit_groups", "mixed_coverees"]
+)
+
+
+def iter_mask_solutions(
+    model: MaskModel, masks: list[int]
+) -> Iterator[list[int]]:
+    """Yield the masks of every solution, with a single digit per cell."""
+    masks = list(masks)
+    queue = [cell for cell, mask in enumerate(masks) if POPCOUNTS[mask] == 1]
+    if any(not mask for mask in masks) or not _propagate(model, masks, queue):
+        return
+    yield from _search(model, masks)
+
+
+def _search(model: MaskModel, masks: list[int]) -> Iterator[list[int]]:
+    # Branch on the cell with fewest digits left.
+    best_cell = None
+    best_count = NUM_DIGITS + 1
+    for cell, mask in enumerate(masks):
+        count = POPCOUNTS[mask]
+        if 1 < count < best_count:
+            best_cell, best_count = cell, count
+            if count == 2:
+                break
+    if best_cell is None:
+        yield masks
+        return
+
+    options = masks[best_cell]
+    while options:
+        bit = options & -options
+        options ^= bit
+        child = masks.copy()
+        child[best_cell] = bit
+        if _propagate(model, child, [best_cell]):
+            yield from _search(model, child)
+
+
+def _propagate(model: MaskModel, masks: list[int], queue: list[int]) -> bool:
+    """Apply the rules until nothing changes. Returns False on a
+    contradiction.
+
+    `queue` holds cells newly down to one digit, whose eliminations haven't
+    been applied yet.
+    """
+    eliminations, digit_groups, mixed_coverees = model
+    while True:
+        while queue:
+            cell = queue.pop()
+            digit = masks[cell].bit_length() - 1
+            for other, cleared in eliminations[cell][digit]:
+                mask = masks[other]
+                if mask & cleared:
+                    mask &= ~cleared
+                    if not mask:
+                        return False
+                    masks[other] = mask
+                    if not mask & (mask - 1):
+                        queue.append(other)
+
+        changed = False
+        for cells, digits in digit_groups:
+            # Digits in at least one of the cells, and in at least two.
+            once = twice = 0
+            for cell in cells:
+                mask = masks[cell]
+                twice |= once & mask
+                once |= mask
+            if digits & ~once:
+                return False
+            hidden = digits & once & ~twice
+            if not hidden:
+                continue
+            for cell in cells:
+                mask = masks[cell]
+                bit = mask & hidden
+                if bit and mask != bit:
+                    if bit & (bit - 1):
+                        return False
+                    masks[cell] = bit
+                    queue.append(cell)
+                    changed = True
+
+        for pairs in mixed_coverees:
+            left = [(cell, mask) for cell, mask in pairs if masks[cell] & mask]
+            if not left:
+                return False
+            if len(left) == 1:
+                cell, mask = left[0]
+                if masks[cell] & ~mask:
+                    masks[cell] &= mask
+                    if POPCOUNTS[masks[cell]] == 1:
+                        queue.append(cell)
+                    changed = True
+
+        if not queue and not changed:
+            return True
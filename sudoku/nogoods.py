@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import collections
+from collections.abc import Iterable
+
+import numpy as np
+
+from sudoku.lru import LRUCache
+
+
+class NogoodStore:
+    """Sets of possibles that can't all be finalised together.
+
+    Holds at most `capacity` nogoods, as an `LRUCache`. Nogoods are indexed
+    by their members, so the ones affected by a change can be found quickly.
+    """
+
+    def __init__(self, capacity: int):
+        self._nogoods = LRUCache(capacity)
+        self._containing = collections.defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._nogoods)
+
+    def add(self, members: Iterable[int]) -> None:
+        key = frozenset(members)
+        if key in self._nogoods:
+            self._nogoods.touch(key)
+            return
+        for member in key:
+            self._containing[member].add(key)
+        evicted = self._nogoods.put(key, np.array(sorted(key), dtype=int))
+        if evicted is not None:
+            evicted_key, _ = evicted
+            for member in evicted_key:
+                self._containing[member].discard(evicted_key)
+                if not self._containing[member]:
+                    del self._containing[member]
+
+    def containing(
+        self, indices: Iterable[int]
+    ) -> list[tuple[frozenset, np.ndarray]]:
+        """The nogoods with any of the given members, as (key, members)."""
+        keys = set()
+        for index in indices:
+            keys.update(self._containing.get(index, ()))
+        return [(key, self._nogoods[key]) for key in keys]
+
+    def mark_used(self, key: frozenset) -> None:
+        self._nogoods.touch(key)
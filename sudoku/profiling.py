@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import collections
+import contextlib
+import time
+from collections.abc import Iterator
+
+from sudoku.exceptions import SudokuContradiction
+
+# Running totals for a timed section of the solver.
+Timing = collections.namedtuple("Timing", ["calls", "seconds"])
+
+
+class SolveProfile:
+    """Counters and timings gathered while solving with profiling on.
+
+    timings: Timing per section, such as a constraint class's
+        `act_on_grid`. Times include any sections nested inside.
+    nodes_per_depth: grids searched at each number of bifurcations.
+    propagation_passes: passes of the propagation loop, including those
+        made while bifurcating and excluding tried options.
+    contradictions: counts of (source, message), where the source is the
+        innermost constraint, coveree check or deduction stage the
+        contradiction came from, or "search" for any other.
+    eliminations: possibles eliminated by each deduction stage.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.nodes_per_depth = collections.Counter()
+        self.propagation_passes = 0
+        self.contradictions = collections.Counter()
+        self.eliminations = collections.Counter()
+        # The last contradiction recorded, so outer sources skip it.
+        self._last_contradiction = None
+
+    @contextlib.contextmanager
+    def timed(self, name: str, source: bool = False) -> Iterator[None]:
+        """Time a section. If `source`, contradictions raised in it are
+        recorded under its name."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        except SudokuContradiction as contradiction:
+            if source:
+                self.record_contradiction(name, contradiction)
+            raise
+        finally:
+            timing = self.timings.get(name, Timing(0, 0))
+            self.timings[name] = Timing(
+                calls=timing.calls + 1,
+                seconds=timing.seconds + time.perf_counter() - start_time,
+            )
+
+    def record_contradiction(
+        self, source: str, contradiction: SudokuContradiction
+    ) -> None:
+        if contradiction is self._last_contradiction:
+            return
+        self._last_contradiction = contradiction
+        self.contradictions[source, str(contradiction)] += 1
+
+    def merge(self, other: SolveProfile) -> None:
+        """Add another profile's counts to this one, e.g. a worker's."""
+        for name, timing in other.timings.items():
+            total = self.timings.get(name, Timing(0, 0))
+            self.timings[name] = Timing(
+                calls=total.calls + timing.calls,
+                seconds=total.seconds + timing.seconds,
+            )
+        self.nodes_per_depth.update(other.nodes_per_depth)
+        self.propagation_passes += other.propagation_passes
+        self.contradictions.update(other.contradictions)
+        self.eliminations.update(other.eliminations)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_last_contradiction"] = None
+        return state
+
+    def report(self) -> str:
+        """The profile as a table of text."""
+        num_nodes = sum(self.nodes_per_depth.values())
+        lines = [
+            f"Search nodes: {num_nodes}, propagation passes per node: "
+            f"{self.propagation_passes / max(num_nodes, 1):.2f}",
+            "",
+            f"{'Depth':>5} {'Nodes':>10}",
+        ]
+        for depth, count in sorted(self.nodes_per_depth.items()):
+            lines.append(f"{depth:>5} {count:>10}")
+
+        lines += [
+            "",
+            f"{'Section':<32} {'Calls':>10} {'Seconds':>10} {'us/call':>10}",
+        ]
+        for name, timing in sorted(
+            self.timings.items(), key=lambda item: -item[1].seconds
+        ):
+            lines.append(
+                f"{name:<32} {timing.calls:>10} {timing.seconds:>10.3f} "
+                f"{timing.seconds / timing.calls * 1e6:>10.1f}"
+            )
+
+        if self.eliminations:
+            lines += ["", f"{'Stage':<32} {'Eliminations':>10}"]
+            for stage, count in self.eliminations.most_common():
+                lines.append(f"{stage:<32} {count:>10}")
+
+        if self.contradictions:
+            lines += ["", f"{'Contradiction source':<32} {'Count':>10}"]
+            for (source, message), count in self.contradictions.most_common():
+                lines.append(f"{source:<32} {count:>10}  {message}")
+        return "\n".join(lines)
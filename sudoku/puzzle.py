@@ -5,34 +5,106 @@ import contextlib
 import copy
 import curses
 import datetime
+import functools
 import itertools
+import multiprocessing
+import queue
 import time
-from multiprocessing import Manager, Pool
+import traceback
+from collections.abc import Callable, Iterable, Iterator
+from multiprocessing.sharedctypes import RawArray
 
 import numpy as np
 
-from sudoku.constraints import DIGITS, Box, Column, Row
+from sudoku.constraints import DIGIT_BITS, DIGITS, Box, Column, Row
+from sudoku.contradictions import (
+    ContradictionGraph,
+    build_csr,
+    gather_rows,
+    split_rows,
+)
+from sudoku.coverees import CovereeStore
+from sudoku.dlx import DancingLinks
 from sudoku.exceptions import SudokuContradiction
+from sudoku.masks import (
+    ALL_DIGITS,
+    POPCOUNTS,
+    MaskModel,
+    iter_mask_solutions,
+)
+from sudoku.nogoods import NogoodStore
+from sudoku.profiling import SolveProfile
+from sudoku.shared import SharedArrays
+from sudoku.solutions import digits_to_possibles, possibles_to_digits
+from sudoku.transpositions import TranspositionTable
 
 FRAME_RATE = 1
+# Stands in for a timed section while not profiling.
+_NOT_TIMED = contextlib.nullcontext()
+# Search engines that `solve` and `iter_solutions` can use.
+ENGINES = ("propagation", "dlx", "masks")
+# Minimum seconds between a worker giving away branches to idle workers.
+MIN_DONATION_INTERVAL = 0.1
 NUM_ROWS = 9
 NUM_COLS = 9
 NUM_CELLS = NUM_ROWS * NUM_COLS
 NUM_DIGITS = 9
 NUM_POSSIBLES = NUM_CELLS * NUM_DIGITS
-MAX_COVEREE_SIZE = 9
+# Deductions that can be tried whenever propagation runs out of changes.
+DEDUCTION_STAGES = ("pointing", "naked_subsets", "hidden_subsets", "probing")
+# The ones tried by default, in order.
+DEFAULT_DEDUCTION_STAGES = ("pointing", "naked_subsets", "hidden_subsets")
+# Largest naked/hidden subsets looked for.
+MAX_SUBSET_SIZE = 3
+# Nogoods kept by `set_nogood_learning` unless told otherwise.
+DEFAULT_NOGOOD_CAPACITY = 10000
+# Larger nogoods are rarely matched again, so aren't kept.
+MAX_NOGOOD_SIZE = 8
+# Bits in the masks of bifurcation levels. The last bit stands for every
+# level from there on down.
+NUM_LEVEL_BITS = 63
+# Grids kept by `set_transposition_table` unless told otherwise.
+DEFAULT_TRANSPOSITION_CAPACITY = 100000
+# Subtrees with more solutions than this don't have their digits cached.
+# Counts are cached however large.
+MAX_CACHED_SOLUTIONS = 1000
 
 Bifurcation = collections.namedtuple(
     "Bifurcation",
-    ["index", "possibles", "finalised", "num_options", "current_option_num"],
+    ["index", "trail_length", "options", "num_options", "current_option_num"],
+)
+
+# Running totals for a deduction stage.
+StageStats = collections.namedtuple(
+    "StageStats", ["calls", "eliminations", "seconds"]
 )
 
-MULTIPROCESS_TASK_COUNT = 50
+# What a multiprocess worker sends back on finishing a task: the weight it
+# finished, and its share of the puzzle's counters and profile.
+TaskReport = collections.namedtuple(
+    "TaskReport",
+    [
+        "weight",
+        "search_nodes",
+        "propagation_passes",
+        "stage_stats",
+        "profile",
+    ],
+)
+
+# A subtree of the search: the possibles to remove and then finalise to reach
+# it, and the fraction of the whole search it accounts for.
+SearchTask = collections.namedtuple(
+    "SearchTask", ["removed", "finalised", "weight"]
+)
 
 
 class Puzzle:
 
     def __init__(self):
+        self._copy_from(_standard_grid())
+
+    def _init_state(self) -> None:
         self.possibles = np.ones(NUM_POSSIBLES + 1).astype(bool)
         self.finalised = np.zeros(NUM_POSSIBLES + 1).astype(bool)
         self.in_valid_solutions = np.zeros(NUM_POSSIBLES + 1)
@@ -42,101 +114,105 @@ class Puzzle:
 
         self.unbifurcated_possibles = self.possibles
 
-        self.contradictions = np.zeros(
-            (NUM_POSSIBLES + 1, NUM_POSSIBLES + 1)
-        ).astype(bool)
-        self.contradictions[-1] = False
-        self.contradictions[:, -1] = False
-        self.coverees = np.array([])
+        self.contradictions = ContradictionGraph(NUM_POSSIBLES + 1)
+        self._coverees = CovereeStore()
         self.screen = None
-        self.solutions = set()
+        self.solutions = []
         self.last_frame_time = 0
         self.bifurcations = []
         self.solve_start_time = 0
 
-        self.multiprocess_progress_dict = None
+        # Shared per-worker slots. Each worker only writes its own slot, so
+        # none of them need a lock.
         self.multiprocessing_id = None
-        self.multiprocess_solution_count = None
-        self.multiprocess_lock = None
-
-        self._init_grid_constraints()
-
-    def solve(self, with_terminal=False, multiprocess=False):
+        self.multiprocess_progress = None
+        self._idle_workers = None
+        self._task_results = None
+        self._task = SearchTask(removed=[], finalised=[], weight=1)
+        self._donated_weight = 0
+        self._last_donation_time = 0
+        # Set while pickling for workers, which attach to it zero-copy.
+        self._shared_model = None
+
+        # Possible indices that changed since they were last propagated.
+        self._changed = []
+        # Undo log of (indices, were_finalised) for every change made.
+        self._trail = []
+        self._propagating = False
+        self._needs_full_pass = True
+        # For each removed or finalised possible, a bit mask of the
+        # bifurcation levels whose choices it follows from.
+        self._reasons = np.zeros(NUM_POSSIBLES + 1, dtype=np.int64)
+        # Nogoods learnt from failed branches, kept during a search if
+        # `nogood_capacity` is set.
+        self.nogood_capacity = 0
+        self._nogoods = None
+        # Solutions below grids searched before, kept across searches if
+        # `transposition_capacity` is set. Cleared when the rules change.
+        self.transposition_capacity = 0
+        self._transpositions = None
+        self._num_solutions = 0
+        # Exact cover columns for the dlx engine, and the rules as digit
+        # masks for the masks engine, built when first needed.
+        self._exact_cover = None
+        self._mask_model = None
+        # Set while counting solutions, which are then never converted to
+        # digits.
+        self._count_only = False
+        self._coveree_index = None
+        self._watchers = None
+        # Possible indices of each house: sets of 9 cells holding every digit
+        # once. Shape (houses, cells, digits), found when first needed.
+        self._houses = None
+
+        self.deduction_stages = list(DEFAULT_DEDUCTION_STAGES)
+        self.stage_stats = {}
+        # Running totals of grids searched and passes of `_propagate`,
+        # including those of multiprocess workers.
+        self.search_nodes = 0
+        self.propagation_passes = 0
+        # Set by `set_profiling` to gather timings and counts while solving.
+        self.profile = None
+        # From the last probe: the possibles each candidate's finalisation
+        # removed, and the trail length and last entry it applies to.
+        self._probe_removals = None
+        self._probe_state = None
+
+        # Maintained from the trail once the solve starts: for each possible
+        # the number of live (possible, unfinalised) possibles it contradicts,
+        # and for each coveree how many possibles remain and are finalised.
+        # They reflect the first `_counts_trail_length` trail entries.
+        self._scores = None
+        self._coveree_remaining = None
+        self._coveree_finalised = None
+        self._counts_trail_length = 0
+
+    def solve(
+        self, with_terminal=False, multiprocess=False, engine="propagation"
+    ):
         # TODO error handling for impossible puzzles
 
         if with_terminal and multiprocess:
             raise ValueError(
                 "Can't specify both `with_terminal` and `multiprocess`."
             )
+        _check_engine(engine, with_terminal or multiprocess)
 
         self.solve_start_time = time.time()
+        self.contradictions.freeze()
+        self.solutions = []
         try:
-            if with_terminal:
+            if engine == "dlx":
+                self.solutions.extend(self._iter_solutions_dlx())
+            elif engine == "masks":
+                self.solutions.extend(self._iter_solutions_masks())
+            elif with_terminal:
                 curses.wrapper(self._solve)
             elif multiprocess:
-                puzzle_copy = copy.deepcopy(self)
-                bifurcations_to_try = puzzle_copy._list_bifurcations() or [[]]
-                results = []
-                with Manager() as manager, Pool() as pool:
-                    progress_dict = manager.dict()
-                    solution_counts = manager.dict()
-                    multi_lock = manager.Lock()
-                    for i, bifurcation_idxs in enumerate(bifurcations_to_try):
-                        puzzle = copy.deepcopy(self)
-                        puzzle.finalise(bifurcation_idxs)
-                        puzzle.multiprocess_progress_dict = progress_dict
-                        puzzle.multiprocessing_id = i
-                        puzzle.multiprocess_solution_count = solution_counts
-                        puzzle.multiprocess_lock = multi_lock
-                        results.append(pool.apply_async(puzzle._solve))
-
-                    time_started = time.time()
-                    total_progress = len(results)
-                    while any(not result.ready() for result in results):
-                        current_progress = sum(progress_dict.values())
-                        normalised_progress = current_progress / total_progress
-                        if normalised_progress == 0:
-                            continue
-                        elapsed_time = time.time() - time_started
-                        projected_finish_time = (
-                            time_started + elapsed_time / normalised_progress
-                        )
-                        finish_time = datetime.datetime.fromtimestamp(
-                            projected_finish_time
-                        )
-                        # TODO technically this isn't thread safe.
-                        with multi_lock:
-                            progress_values = copy.deepcopy(
-                                progress_dict.values()
-                            )
-                            solution_counts_copy = copy.deepcopy(
-                                solution_counts
-                            )
-
-                        done_count = len([v for v in progress_values if v == 1])
-                        in_progress_count = len(
-                            [v for v in progress_values if 0 < v < 1]
-                        )
-                        unstarted_count = (
-                            len(results) - done_count - in_progress_count
-                        )
-                        solution_count = sum(
-                            count for count in solution_counts_copy.values()
-                        )
-                        print(
-                            f"Progress {normalised_progress:.2%}, projected "
-                            f"finish time {finish_time.isoformat()}. "
-                            f"Done: {done_count}, "
-                            f"in progress: {in_progress_count}, "
-                            f"yet to start: {unstarted_count}. "
-                            f"Found {solution_count} solutions.",
-                            end="\r",
-                        )
-                        time.sleep(1)
-
-                self.solutions = {
-                    sol for result in results for sol in result.get()
-                }
+                for solution in self._iter_solutions_multiprocess(
+                    show_progress=True
+                ):
+                    self.solutions.append(solution)
             else:
                 self._solve()
         finally:
@@ -146,110 +222,1115 @@ class Puzzle:
                     "solution" if len(self.solutions) == 1 else "solutions",
                 )
             )
+            total_possibles = np.zeros(NUM_POSSIBLES + 1, dtype=bool)
             for i, solution in enumerate(self.solutions):
                 print(f"SOLUTION {i}".center(30, "-"))
-                self.simple_draw(solution)
-
-            total_possibles = [False for _ in range(len(self.possibles))]
-            for solution in self.solutions:
-                for i, possible in enumerate(solution):
-                    total_possibles[i] |= possible
+                possibles = self.digits_to_possibles(solution)
+                self.simple_draw(possibles)
+                total_possibles |= possibles
 
             print("COMBINED SOLUTION".center(30, "-"))
             self.simple_draw(total_possibles)
 
+    def iter_solutions(
+        self,
+        limit: int | None = None,
+        multiprocess: bool = False,
+        engine: str = "propagation",
+    ) -> Iterator[np.ndarray]:
+        """Yield each solution as an array of 81 digits as soon as it's found.
+
+        Solutions aren't kept, so memory use doesn't grow with their number.
+        Stops after `limit` solutions if given; a limit of 2 is enough to
+        check that the solution is unique. `engine` is one of `ENGINES`.
+        """
+        if limit is not None and limit < 1:
+            raise ValueError(f"Solution limit must be positive, got {limit}.")
+        _check_engine(engine, multiprocess)
+
+        self.solve_start_time = time.time()
+        self.contradictions.freeze()
+        if engine == "dlx":
+            solutions = self._iter_solutions_dlx()
+        elif engine == "masks":
+            solutions = self._iter_solutions_masks()
+        elif multiprocess:
+            solutions = self._iter_solutions_multiprocess()
+        else:
+            solutions = self._search()
+        return self._limit_solutions(solutions, limit)
+
+    @staticmethod
+    def _limit_solutions(
+        solutions: Iterator[np.ndarray], limit: int | None
+    ) -> Iterator[np.ndarray]:
+        # Closing the search on exit restores the grid, even if the caller
+        # stops iterating early.
+        with contextlib.closing(solutions):
+            for num_found, solution in enumerate(solutions, 1):
+                yield solution
+                if num_found == limit:
+                    return
+
+    def count_solutions(
+        self, limit: int | None = None, multiprocess: bool = False
+    ) -> int:
+        """Count the solutions, stopping once there are `limit` of them.
+
+        Solutions are only counted, never kept, drawn or even converted to
+        digits.
+        """
+        if limit is not None and limit < 1:
+            raise ValueError(f"Solution limit must be positive, got {limit}.")
+
+        self.solve_start_time = time.time()
+        self.contradictions.freeze()
+        self._count_only = True
+        num_found = 0
+        try:
+            if multiprocess:
+                counts = self._iter_solutions_multiprocess(limit=limit)
+            else:
+                counts = (1 for _ in self._search())
+            with contextlib.closing(counts):
+                for count in counts:
+                    num_found += count
+                    if limit is not None and num_found >= limit:
+                        return limit
+        finally:
+            self._count_only = False
+        return num_found
+
+    def is_unique(self, multiprocess: bool = False) -> bool:
+        """Whether the puzzle has exactly one solution."""
+        return self.count_solutions(limit=2, multiprocess=multiprocess) == 1
+
+    def copy(self) -> Puzzle:
+        """Copy the puzzle, e.g. to set up one of several variants of it.
+
+        The copy shares the compiled contradictions and coverees with this
+        puzzle, so it is cheap to make. Givens, coverees, contradictions and
+        constraints added to either puzzle don't affect the other.
+        """
+        if self.bifurcations:
+            raise ValueError("Can't copy a puzzle in the middle of a solve.")
+        clone = Puzzle.__new__(Puzzle)
+        clone._copy_from(self)
+        return clone
+
+    def _copy_from(self, other: Puzzle) -> None:
+        self.__dict__.update(other.__dict__)
+        self.possibles = other.possibles.copy()
+        self.finalised = other.finalised.copy()
+        self.in_valid_solutions = other.in_valid_solutions.copy()
+        self.unbifurcated_possibles = self.possibles
+        self.contradictions = other.contradictions.copy()
+        self._coverees = other._coverees.copy()
+        self.constraints = []
+        for constraint in other.constraints:
+            constraint = copy.copy(constraint)
+            constraint.puzzle = self
+            self.constraints.append(constraint)
+        self.screen = None
+        self.solutions = []
+        self.bifurcations = []
+        self._changed = list(other._changed)
+        self._trail = list(other._trail)
+        self._reasons = other._reasons.copy()
+        self._nogoods = None
+        self._transpositions = None
+        self._watchers = None
+        self._shared_model = None
+        self.deduction_stages = list(other.deduction_stages)
+        self.stage_stats = {}
+        self.search_nodes = 0
+        self.propagation_passes = 0
+        if other.profile is not None:
+            self.profile = SolveProfile()
+        self._probe_state = None
+        if other._scores is not None:
+            self._scores = other._scores.copy()
+            self._coveree_remaining = other._coveree_remaining.copy()
+            self._coveree_finalised = other._coveree_finalised.copy()
+
+    def solve_variants(
+        self,
+        variants: Iterable[Callable[[Puzzle], None]],
+        limit: int | None = None,
+        multiprocess: bool = False,
+    ) -> Iterator[list[np.ndarray]]:
+        """Solve variants of this puzzle without rebuilding it for each one.
+
+        Each variant is a function that adds givens, coverees, contradictions
+        or constraints to a copy of this puzzle. Yields each variant's
+        solutions in order; contradictory variants have none. With
+        `multiprocess`, variants are solved in a process pool, so they must be
+        picklable. Workers receive this puzzle once, through shared memory.
+        """
+        self.contradictions.freeze()
+        if not multiprocess:
+            for variant in variants:
+                yield _solve_variant(self, variant, limit)
+            return
+
+        with self._share_model() as shared_model:
+            self._shared_model = shared_model
+            try:
+                pool = multiprocessing.Pool(
+                    initializer=_init_variant_worker, initargs=(self,)
+                )
+            finally:
+                self._shared_model = None
+            with pool:
+                yield from pool.imap(
+                    _solve_base_variant,
+                    ((variant, limit) for variant in variants),
+                )
+
     def _solve(self, screen=None):
         self.screen = screen
         self._init_colors()
-        output = self._solve_or_bifurcate()
+        for solution in self._search():
+            self.solutions.append(solution)
         self._update_multiprocess_progress(override_value=1)
-        return output
 
-    def _solve_or_bifurcate(self):
+    def _search(self) -> Iterator[np.ndarray]:
+        """Yield every solution below the current grid, then restore it.
+
+        Deductions made before the first bifurcation are kept. Yields nothing
+        if the grid is contradictory.
+        """
+        self._probe_state = None
+        if self.nogood_capacity:
+            self._nogoods = NogoodStore(self.nogood_capacity)
+        if self.transposition_capacity and self._transpositions is None:
+            self._transpositions = TranspositionTable(
+                self.transposition_capacity
+            )
+        try:
+            yield from self._search_subtree()
+        except SudokuContradiction:
+            pass
+        finally:
+            self._nogoods = None
+
+    def _search_subtree(self) -> Iterator[np.ndarray]:
+        """Search below the current grid for `_search`.
+
+        Returns the solutions as an (n, 81) array if it found all of them
+        and there were few enough to cache, or just their number when only
+        counting. Otherwise returns None. With nogood
+        learning, raises a contradiction if a failed branch shows that the
+        rest of the subtree has no solutions.
+        """
+        self.search_nodes += 1
+        if self.profile is not None:
+            self.profile.nodes_per_depth[len(self.bifurcations)] += 1
         self._logical_solve_til_no_change()
         if self.is_finished:
-            return copy.deepcopy(self.solutions)
-        idxs_to_bifurcate = self._select_bifurcation_coveree()
-        for bifurcation_num, idx in enumerate(idxs_to_bifurcate):
-            try:
-                with self._bifurcate(
-                    idx, len(idxs_to_bifurcate), bifurcation_num
+            solution = self._add_solution()
+            yield solution
+            return 1 if self._count_only else solution[np.newaxis]
+
+        key = None
+        found = None
+        if self._transpositions is not None:
+            key = TranspositionTable.key(self.possibles)
+            cached = self._transpositions.get(key, self._count_only)
+            if cached is not None and self._count_only:
+                num_cached = cached if isinstance(cached, int) else len(cached)
+                self._num_solutions += num_cached
+                for _ in range(num_cached):
+                    yield None
+                return num_cached
+            if cached is not None:
+                for solution in cached:
+                    yield self._add_cached_solution(solution)
+                return cached
+            found = []
+            num_found = 0
+            donated_weight = self._donated_weight
+
+        level = len(self.bifurcations)
+        trail_length = len(self._trail)
+        with self._timed("select_bifurcation_coveree"):
+            idxs_to_bifurcate = self._select_bifurcation_coveree()
+        num_options = len(idxs_to_bifurcate)
+        bifurcation_num = 0
+        try:
+            # Donating branches to other workers shortens `idxs_to_bifurcate`.
+            while bifurcation_num < len(idxs_to_bifurcate):
+                idx = idxs_to_bifurcate[bifurcation_num]
+                reason = None
+                num_solutions = self._num_solutions
+                try:
+                    with self._bifurcate(
+                        idxs_to_bifurcate, num_options, bifurcation_num
+                    ):
+                        if self._work_requested():
+                            self._donate_branches()
+                        self._refresh_screen()
+                        found_below = yield from self._search_subtree()
+                    if found is not None and found_below is not None:
+                        found.append(found_below)
+                        num_found += (
+                            found_below
+                            if self._count_only
+                            else len(found_below)
+                        )
+                    else:
+                        found = None
+                except SudokuContradiction as contradiction:
+                    if self.profile is not None:
+                        self.profile.record_contradiction(
+                            "search", contradiction
+                        )
+                    if self._num_solutions != num_solutions:
+                        # Solutions were found before the branch failed.
+                        found = None
+                    if self._nogoods is not None:
+                        reason = self._learn_nogood(idx, contradiction.levels)
+                        if not reason & _level_bit(level):
+                            # The branch failed regardless of this option, so
+                            # every other option here fails too.
+                            if not level:
+                                break
+                            raise SudokuContradiction(
+                                "Backjumping past failed bifurcation",
+                                levels=reason,
+                            )
+                        if level < NUM_LEVEL_BITS - 1:
+                            reason &= ~_level_bit(level)
+
+                if (
+                    found is not None
+                    and not self._count_only
+                    and num_found > MAX_CACHED_SOLUTIONS
                 ):
-                    self._refresh_screen()
-                    self._solve_or_bifurcate()
-            except SudokuContradiction:
-                self.possibles[idx] = False
+                    found = None
+
+                # Every solution using this option has been found, so exclude
+                # it from the remaining branches.
+                try:
+                    self.remove_possibles([idx], reason=reason)
+                    self._propagate()
+                except SudokuContradiction:
+                    break
+                bifurcation_num += 1
+        finally:
+            self._undo(trail_length)
+
+        if found is None or self._donated_weight != donated_weight:
+            return None
+        if self._count_only:
+            found = num_found
+        elif found:
+            found = np.concatenate(found)
+        else:
+            found = np.zeros((0, NUM_CELLS), dtype=np.uint8)
+        self._transpositions.put(key, found)
+        return found
+
+    def _iter_solutions_dlx(self) -> Iterator[np.ndarray]:
+        """Search the puzzle as an exact cover problem with dancing links.
+
+        Constraints that act during the solve aren't supported.
+        """
+        if self._build_watchers()[0]:
+            raise ValueError(
+                "The dlx engine doesn't support constraints that act during "
+                "the solve."
+            )
+        if self._exact_cover is None:
+            self._exact_cover = self._build_exact_cover()
+        num_exact, num_pairs, columns, at_least_one, usable = self._exact_cover
+        if np.any(self.finalised & ~usable):
+            return
+
+        options = np.flatnonzero(self.possibles & usable)
+        links = DancingLinks(
+            num_exact, num_pairs, (columns[i] for i in options.tolist())
+        )
+        for row in np.flatnonzero(self.finalised[options]).tolist():
+            if not links.select(row):
+                return
+
+        for rows in links.solutions():
+            solution = self.finalised.copy()
+            solution[options[rows]] = True
+            if np.all(solution[at_least_one].any(axis=1)):
+                yield self._add_solution(solution)
+
+    def _build_exact_cover(
+        self,
+    ) -> tuple[int, int, list, np.ndarray, np.ndarray]:
+        """Turn the coverees and contradictions into exact cover columns.
+
+        Coverees whose options all contradict each other must be covered
+        exactly once. Each contradiction not already within one of those is
+        a column that may be covered at most once. Returns the numbers of
+        both kinds of column, the columns of each possible, the other
+        coverees, which are checked against each solution instead, and a
+        mask of the possibles that don't contradict themselves.
+        """
+        coverees = self.coverees
+        packed_rows = self.contradictions.packed_rows()
+        options = np.where(coverees == -1, NUM_POSSIBLES, coverees)
+        contradicted = (
+            packed_rows[
+                options[:, :, np.newaxis], options[:, np.newaxis, :] // 8
+            ]
+            >> (7 - options[:, np.newaxis, :] % 8)
+            & 1
+        )
+        padding = coverees == -1
+        exclusive = (
+            contradicted.astype(bool)
+            | padding[:, :, np.newaxis]
+            | padding[:, np.newaxis, :]
+            | np.eye(coverees.shape[1], dtype=bool)
+        )
+        is_exact = np.all(exclusive, axis=(1, 2))
+        exact = coverees[is_exact]
+
+        in_exact = np.zeros((NUM_POSSIBLES + 1, len(exact)), dtype=bool)
+        in_exact[exact, np.arange(len(exact))[:, np.newaxis]] = True
+        in_exact[-1] = False
+        indptr = self.contradictions.indptr
+        first = np.repeat(np.arange(NUM_POSSIBLES + 1), np.diff(indptr))
+        second = self.contradictions.indices.astype(np.intp)
+        # A possible contradicting itself can never be used, so gets no row.
+        usable = np.ones(NUM_POSSIBLES + 1, dtype=bool)
+        usable[first[first == second]] = False
+        first, second = first[first < second], second[first < second]
+        packed = np.packbits(in_exact, axis=1)
+        within_exact = np.any(packed[first] & packed[second], axis=1)
+        first, second = first[~within_exact], second[~within_exact]
+
+        exact_rows, exact_columns = np.nonzero(in_exact)
+        pair_columns = len(exact) + np.arange(len(first))
+        indptr, indices = build_csr(
+            np.concatenate([exact_rows, first, second]),
+            np.concatenate([exact_columns, pair_columns, pair_columns]),
+            NUM_POSSIBLES + 1,
+        )
+        indices = indices.tolist()
+        columns = [
+            indices[start:end]
+            for start, end in zip(indptr[:-1].tolist(), indptr[1:].tolist())
+        ]
+        return len(exact), len(first), columns, coverees[~is_exact], usable
+
+    def _iter_solutions_masks(self) -> Iterator[np.ndarray]:
+        """Search with a digit mask per cell, in plain Python ints.
+
+        Much cheaper per node than propagation, but only understands
+        coverees and contradictions. Puzzles with constraints that act during
+        the solve are searched with propagation instead.
+        """
+        if self._build_watchers()[0]:
+            yield from self._search()
+            return
+        if self._mask_model is None:
+            self._mask_model = self._build_mask_model()
+        model, allowed = self._mask_model
+
+        cell_masks = (
+            self.possibles[:NUM_POSSIBLES].reshape(NUM_CELLS, NUM_DIGITS)
+            @ DIGIT_BITS
+        ) & allowed
+        for solution in iter_mask_solutions(model, cell_masks.tolist()):
+            digits = np.array(
+                [mask.bit_length() for mask in solution], dtype=np.uint8
+            )
+            yield self._add_solution(self.digits_to_possibles(digits))
+
+    def _build_mask_model(self) -> tuple[MaskModel, np.ndarray]:
+        """Express the coverees and contradictions as digit masks.
+
+        Also returns a mask of the digits each cell can ever hold.
+        """
+        allowed = np.full(NUM_CELLS, ALL_DIGITS)
+        indptr = self.contradictions.indptr
+        first = np.repeat(np.arange(NUM_POSSIBLES + 1), np.diff(indptr))
+        second = self.contradictions.indices.astype(np.intp)
+        first_cell, first_digit = np.divmod(first, NUM_DIGITS)
+        second_cell, second_digit = np.divmod(second, NUM_DIGITS)
+        # A possible contradicting itself can never be used.
+        itself = first == second
+        np.bitwise_and.at(
+            allowed, first_cell[itself], ~(1 << first_digit[itself])
+        )
 
+        # Digits in one cell already exclude each other.
+        elsewhere = first_cell != second_cell
+        keys, key_ids = np.unique(
+            first[elsewhere] * NUM_CELLS + second_cell[elsewhere],
+            return_inverse=True,
+        )
+        cleared = np.zeros(len(keys), dtype=int)
+        np.bitwise_or.at(cleared, key_ids, 1 << second_digit[elsewhere])
+        eliminations = [
+            [[] for _ in range(NUM_DIGITS)] for _ in range(NUM_CELLS)
+        ]
+        for key, mask in zip(keys.tolist(), cleared.tolist()):
+            possible, other_cell = divmod(key, NUM_CELLS)
+            cell, digit = divmod(possible, NUM_DIGITS)
+            eliminations[cell][digit].append((other_cell, mask))
+
+        digit_groups = collections.defaultdict(int)
+        mixed_coverees = []
+        for coveree in self.coverees.tolist():
+            cell_masks = collections.defaultdict(int)
+            for index in coveree:
+                if index != -1:
+                    cell, digit = divmod(index, NUM_DIGITS)
+                    cell_masks[cell] |= 1 << digit
+            digit_masks = set(cell_masks.values())
+            if len(cell_masks) == 1:
+                ((cell, mask),) = cell_masks.items()
+                allowed[cell] &= mask
+            elif len(digit_masks) == 1 and POPCOUNTS[min(digit_masks)] == 1:
+                # One digit in several cells.
+                digit_groups[tuple(sorted(cell_masks))] |= min(digit_masks)
+            else:
+                mixed_coverees.append(tuple(cell_masks.items()))
+
+        model = MaskModel(
+            eliminations=[
+                [tuple(pairs) for pairs in cell] for cell in eliminations
+            ],
+            digit_groups=list(digit_groups.items()),
+            mixed_coverees=mixed_coverees,
+        )
+        return model, allowed
+
+    def _iter_solutions_multiprocess(
+        self, show_progress: bool = False, limit: int | None = None
+    ) -> Iterator[np.ndarray | int]:
+        """Search with a pool of workers that split work between them.
+
+        Workers start from a queue of tasks. Whenever a worker goes idle, busy
+        workers hand their untried sibling branches back as new tasks.
+        Solutions are yielded as the workers find them. While counting, the
+        numbers of solutions found are yielded instead, in batches; `limit`
+        is how many the caller needs before it stops early.
+        """
         try:
             self._logical_solve_til_no_change()
         except SudokuContradiction:
-            return set()
-        return copy.deepcopy(self.solutions)
+            return
+        num_workers = multiprocessing.cpu_count()
+        task_queue = multiprocessing.Queue()
+        result_queue = multiprocessing.Queue()
+        progress = RawArray("d", num_workers)
+        idle_workers = RawArray("b", num_workers)
+
+        with self._share_model() as shared_model:
+            self.multiprocess_progress = progress
+            self._shared_model = shared_model
+            workers = [
+                multiprocessing.Process(
+                    target=_search_worker,
+                    args=(
+                        self,
+                        worker_id,
+                        task_queue,
+                        result_queue,
+                        idle_workers,
+                        limit,
+                    ),
+                    daemon=True,
+                )
+                for worker_id in range(num_workers)
+            ]
+            for worker in workers:
+                worker.start()
+            self.multiprocess_progress = None
+            self._shared_model = None
+
+            task_queue.put(SearchTask(removed=[], finalised=[], weight=1))
+            outstanding_tasks = 1
+            done_count = 0
+            finished_weight = 0
+            solution_count = 0
+            time_started = time.time()
+            last_print_time = 0
+            try:
+                while outstanding_tasks:
+                    try:
+                        message, payload = result_queue.get(
+                            timeout=1 / FRAME_RATE
+                        )
+                    except queue.Empty:
+                        message = None
+
+                    if message == "solution":
+                        solution_count += 1
+                        yield payload
+                    elif message == "count":
+                        solution_count += payload
+                        yield payload
+                    elif message == "tasks":
+                        for task in payload:
+                            task_queue.put(task)
+                        outstanding_tasks += len(payload)
+                    elif message == "done":
+                        outstanding_tasks -= 1
+                        done_count += 1
+                        finished_weight += payload.weight
+                        self._add_task_report(payload)
+                    elif message == "error":
+                        raise RuntimeError(f"Search worker failed:\n{payload}")
+
+                    if not show_progress:
+                        continue
+                    if time.time() - last_print_time < 1 / FRAME_RATE:
+                        continue
+                    last_print_time = time.time()
+                    total_progress = finished_weight + sum(progress)
+                    if total_progress == 0:
+                        continue
+                    elapsed_time = time.time() - time_started
+                    finish_time = datetime.datetime.fromtimestamp(
+                        time_started + elapsed_time / min(total_progress, 1)
+                    )
+                    in_progress_count = num_workers - sum(idle_workers)
+                    print(
+                        f"Progress {total_progress:.2%}, projected "
+                        f"finish time {finish_time.isoformat()}. "
+                        f"Done: {done_count}, "
+                        f"in progress: {in_progress_count}, "
+                        f"yet to start: "
+                        f"{max(outstanding_tasks - in_progress_count, 0)}. "
+                        f"Found {solution_count} solutions.",
+                        end="\r",
+                    )
+            finally:
+                if outstanding_tasks:
+                    # Stopped early, so abandon the tasks still running.
+                    for worker in workers:
+                        worker.terminate()
+                for _ in workers:
+                    task_queue.put(None)
+                for worker in workers:
+                    worker.join(timeout=1)
+                    if worker.is_alive():
+                        worker.terminate()
+
+    def _solve_task(self, task: SearchTask) -> Iterator[np.ndarray]:
+        """Yield the solutions in a task's subtree, then restore the grid."""
+        trail_length = len(self._trail)
+        self._task = task
+        self._donated_weight = 0
+        try:
+            self.remove_possibles(task.removed)
+            self.finalise(task.finalised)
+            yield from self._search()
+        except SudokuContradiction:
+            pass
+        finally:
+            self._undo(trail_length)
+
+    def _add_task_report(self, report: TaskReport) -> None:
+        self.search_nodes += report.search_nodes
+        self.propagation_passes += report.propagation_passes
+        for stage, stats in report.stage_stats.items():
+            total = self.stage_stats.get(stage, StageStats(0, 0, 0))
+            self.stage_stats[stage] = StageStats(
+                *(a + b for a, b in zip(total, stats))
+            )
+        if self.profile is not None and report.profile is not None:
+            self.profile.merge(report.profile)
 
-    def _list_bifurcations(
-        self, current_bifurcations=None, trivial_bifurcations=None
-    ):
-        """Simulate a few branches of a solve to get a list of bifurcations."""
-        current_bifurcations = current_bifurcations or []
-        trivial_bifurcations = trivial_bifurcations or []
-        level = 0 if not current_bifurcations else len(current_bifurcations[0])
-        print(
-            f"Enumerating bifurcations: found {len(current_bifurcations)}/"
-            f"{MULTIPROCESS_TASK_COUNT} on level {level}",
-            end="\r",
+    def _work_requested(self) -> bool:
+        if self._idle_workers is None:
+            return False
+        if time.time() - self._last_donation_time < MIN_DONATION_INTERVAL:
+            return False
+        return any(self._idle_workers)
+
+    def _donate_branches(self) -> None:
+        """Hand the untried options of the shallowest bifurcation to the pool.
+
+        The donated options are cut from this worker's own search.
+        """
+        weight = self._task.weight
+        removed = list(self._task.removed)
+        finalised = list(self._task.finalised)
+        for bifurcation in self.bifurcations:
+            weight /= bifurcation.num_options
+            options = bifurcation.options
+            untried = options[bifurcation.current_option_num + 1 :]
+            if untried:
+                break
+            removed.extend(options[: bifurcation.current_option_num])
+            finalised.append(bifurcation.index)
+        else:
+            return
+
+        tasks = [
+            SearchTask(
+                removed=removed + options[:option_num],
+                finalised=finalised + [options[option_num]],
+                weight=weight,
+            )
+            for option_num in range(
+                bifurcation.current_option_num + 1, len(options)
+            )
+        ]
+        del options[bifurcation.current_option_num + 1 :]
+        self._donated_weight += weight * len(tasks)
+        self._last_donation_time = time.time()
+        self._task_results.put(("tasks", tasks))
+
+    def set_nogood_learning(
+        self, capacity: int | None = DEFAULT_NOGOOD_CAPACITY
+    ) -> None:
+        """Learn nogoods from failed branches during searches.
+
+        Keeps up to `capacity` of them; None or 0 turns learning off.
+        """
+        if capacity is not None and capacity < 0:
+            raise ValueError(f"Capacity must not be negative, got {capacity}.")
+        self.nogood_capacity = capacity or 0
+
+    def set_transposition_table(
+        self, capacity: int | None = DEFAULT_TRANSPOSITION_CAPACITY
+    ) -> None:
+        """Cache the solutions below each grid searched, so later searches
+        reaching the same grid reuse them.
+
+        Keeps up to `capacity` grids; None or 0 turns caching off. A single
+        search never meets the same grid twice, as each branch excludes the
+        options of the ones before it, so this only helps repeated searches.
+        While counting, just the number of solutions below each grid is kept.
+        """
+        if capacity is not None and capacity < 0:
+            raise ValueError(f"Capacity must not be negative, got {capacity}.")
+        self.transposition_capacity = capacity or 0
+        self._transpositions = None
+
+    def set_profiling(self, enabled: bool = True) -> None:
+        """Gather a `SolveProfile` in `profile` while solving, or stop.
+
+        Turning profiling on starts a fresh profile. Multiprocess workers'
+        profiles are merged into it as their tasks finish.
+        """
+        self.profile = SolveProfile() if enabled else None
+
+    def _timed(self, name: str, source: bool = False):
+        """Time a section if profiling, as for `SolveProfile.timed`."""
+        if self.profile is None:
+            return _NOT_TIMED
+        return self.profile.timed(name, source)
+
+    def _learn_nogood(self, option: int, levels: int | None) -> int:
+        """Record the choices that made a branch fail as a nogood.
+
+        `levels` masks the bifurcation levels the failure followed from, out
+        of the current ones and the failed option's. Returns it, with every
+        level if it was unknown.
+        """
+        decisions = [b.index for b in self.bifurcations] + [option]
+        if levels is None:
+            levels = _levels_mask(len(decisions))
+        members = [
+            index
+            for level, index in enumerate(decisions)
+            if levels & _level_bit(level)
+        ]
+        # Nogoods using every choice on the path can't come up again, as the
+        # partition of the search excludes each option once it's done.
+        if len(members) < len(decisions) and len(members) <= MAX_NOGOOD_SIZE:
+            self._nogoods.add(members)
+        return levels
+
+    def _apply_nogoods(self, finalised: np.ndarray) -> None:
+        """Remove the last member of nogoods with the rest finalised."""
+        for key, members in self._nogoods.containing(finalised.tolist()):
+            is_finalised = self.finalised[members]
+            if np.count_nonzero(~is_finalised) > 1:
+                continue
+            self._nogoods.mark_used(key)
+            reason = self._reason_of(members[is_finalised])
+            if np.all(is_finalised):
+                raise SudokuContradiction("Nogood finalised", levels=reason)
+            self.remove_possibles(members[~is_finalised], reason=reason)
+
+    def _reason_of(self, possible_indices: np.ndarray) -> int:
+        """The levels that removing or finalising any of the given possibles
+        followed from. Live ones are skipped."""
+        possible_indices = np.asarray(possible_indices)
+        live = (
+            self.possibles[possible_indices] & ~self.finalised[possible_indices]
         )
+        return int(np.bitwise_or.reduce(self._reasons[possible_indices][~live]))
 
-        self._logical_solve_til_no_change()
-        if self.is_finished:
+    def _logical_solve_til_no_change(self):
+        if self._needs_full_pass:
+            # Possibles may have been edited directly during setup, so wake
+            # every constraint and coveree once.
+            self._needs_full_pass = False
+            self._changed.append(np.arange(NUM_POSSIBLES))
+            self._rebuild_counts()
+        self._propagate()
+        while self._run_deduction_stages():
+            self._propagate()
+
+    def set_deduction_stages(self, stages: Iterable[str]) -> None:
+        """Choose which of `DEDUCTION_STAGES` run, and in what order."""
+        stages = list(stages)
+        unknown = set(stages) - set(DEDUCTION_STAGES)
+        if unknown:
+            raise ValueError(f"Unknown deduction stages {sorted(unknown)}.")
+        self.deduction_stages = stages
+        self._probe_state = None
+
+    def _run_deduction_stages(self) -> bool:
+        """Run deduction stages until one eliminates something.
+
+        Returns whether any did, so cheaper propagation can run first before
+        the later stages.
+        """
+        for stage in self.deduction_stages:
+            start_time = time.perf_counter()
+            num_eliminated = 0
+            try:
+                with self._timed(f"deduce_{stage}", source=True):
+                    num_eliminated = getattr(self, f"_deduce_{stage}")()
+            finally:
+                stats = self.stage_stats.get(stage, StageStats(0, 0, 0))
+                self.stage_stats[stage] = StageStats(
+                    calls=stats.calls + 1,
+                    eliminations=stats.eliminations + num_eliminated,
+                    seconds=stats.seconds + time.perf_counter() - start_time,
+                )
+            if self.profile is not None:
+                self.profile.eliminations[stage] += num_eliminated
+            if num_eliminated:
+                return True
+        return False
+
+    def _deduce_pointing(self) -> int:
+        """Remove possibles that contradict every option left in a coveree.
+
+        Covers pointing and claiming, as well as any other coveree whose
+        options all see a common possible.
+        """
+        self._sync_counts()
+        coverees = self.coverees[
+            (self._coveree_finalised == 0) & (self._coveree_remaining >= 2)
+        ]
+        if not len(coverees):
+            return 0
+        contradicted = self.contradictions.packed_rows()[coverees]
+        # Options no longer possible, and padding, mustn't limit the result.
+        contradicted[~self.possibles[coverees]] = 0xFF
+        contradicted_by_all = np.bitwise_and.reduce(contradicted, axis=1)
+        eliminated = np.unpackbits(
+            np.bitwise_or.reduce(contradicted_by_all, axis=0),
+            count=NUM_POSSIBLES + 1,
+        ).astype(bool)
+        eliminated &= self.possibles
+        if not np.any(eliminated):
+            return 0
+        # Only the coverees that eliminated something matter to the reason.
+        live = np.packbits(eliminated)
+        used = np.any(contradicted_by_all & live, axis=1)
+        return self._eliminate(
+            np.flatnonzero(eliminated),
+            reason=self._reason_of(coverees[used]),
+        )
+
+    def _deduce_naked_subsets(self) -> int:
+        """In each house, remove the digits of N cells with only N options
+        between them from the house's other cells."""
+        houses = self._find_houses()
+        removed = _subset_eliminations(self.possibles[houses])
+        return self._eliminate_from_houses(houses, removed)
+
+    def _deduce_hidden_subsets(self) -> int:
+        """In each house, remove the other options from N cells that are the
+        only places left for N digits."""
+        houses = self._find_houses().transpose(0, 2, 1)
+        removed = _subset_eliminations(self.possibles[houses])
+        return self._eliminate_from_houses(houses, removed)
+
+    def _deduce_probing(self) -> int:
+        """Try finalising each option of the smallest open coverees.
+
+        Options that lead straight to a contradiction are removed. How many
+        possibles the others remove guides the choice of bifurcation.
+        """
+        candidates = self._smallest_open_coverees()
+        candidates = np.unique(candidates[candidates != -1])
+        removals = np.zeros(NUM_POSSIBLES + 1)
+        failed = []
+        for index in candidates.tolist():
+            trail_length = len(self._trail)
+            try:
+                self.finalise([index])
+                removals[index] = sum(
+                    len(indices) for indices, _ in self._trail[trail_length:]
+                )
+            except SudokuContradiction:
+                failed.append(index)
+            finally:
+                self._undo(trail_length)
+
+        self._probe_removals = removals
+        self._probe_state = self._trail_state()
+        return self._eliminate(np.array(failed, dtype=int))
+
+    def _trail_state(self) -> tuple:
+        return len(self._trail), self._trail[-1] if self._trail else None
+
+    def _probe_is_current(self) -> bool:
+        """Whether the grid is unchanged since the last probe."""
+        if self._probe_state is None:
+            return False
+        trail_length, last_entry = self._probe_state
+        # Entries hold arrays, so they are compared by identity. The probe
+        # state keeps its entry alive, so a new one can't reuse it.
+        return trail_length == len(self._trail) and (
+            not self._trail or self._trail[-1] is last_entry
+        )
+
+    def _eliminate(self, indices: np.ndarray, reason: int | None = None) -> int:
+        indices = np.unique(indices[self.possibles[indices]])
+        self.remove_possibles(indices, reason)
+        return len(indices)
+
+    def _eliminate_from_houses(
+        self, houses: np.ndarray, removed: np.ndarray
+    ) -> int:
+        """Eliminate the `removed` options of each house.
+
+        They follow from the options already gone from the houses involved.
+        """
+        used = np.any(removed, axis=(1, 2))
+        if not np.any(used):
+            return 0
+        return self._eliminate(
+            houses[removed], reason=self._reason_of(houses[used])
+        )
+
+    def _find_houses(self) -> np.ndarray:
+        """Find sets of 9 cells that must hold each digit exactly once.
+
+        A house needs a coveree over its cells for each digit, and each digit
+        must contradict itself between every pair of its cells.
+        """
+        if self._houses is not None:
+            return self._houses
+        coverees = self.coverees
+        if coverees.shape[1] > NUM_DIGITS:
+            coverees = coverees[np.all(coverees[:, NUM_DIGITS:] == -1, axis=1)]
+        coverees = coverees[:, :NUM_DIGITS]
+        if coverees.shape[1] == NUM_DIGITS:
+            coverees = coverees[np.all(coverees != -1, axis=1)]
+        else:
+            coverees = np.zeros((0, NUM_DIGITS), dtype=int)
+
+        # Coverees of a single digit over 9 different cells.
+        digits = coverees[:, 0] % NUM_DIGITS
+        cells = np.sort(coverees // NUM_DIGITS, axis=1)
+        single_digit = np.all(coverees % NUM_DIGITS == digits[:, None], axis=1)
+        distinct_cells = np.all(np.diff(cells, axis=1) > 0, axis=1)
+        digits = digits[single_digit & distinct_cells]
+        cells = cells[single_digit & distinct_cells]
+
+        cell_sets, cell_set_ids = np.unique(cells, axis=0, return_inverse=True)
+        has_digit = np.zeros((len(cell_sets), NUM_DIGITS), dtype=bool)
+        has_digit[cell_set_ids.reshape(-1), digits] = True
+        cell_sets = cell_sets[np.all(has_digit, axis=1)]
+        houses = cell_sets[:, :, np.newaxis] * NUM_DIGITS + np.arange(
+            NUM_DIGITS
+        )
+
+        dense = self.contradictions.to_dense()
+        first, second = np.triu_indices(NUM_DIGITS, k=1)
+        exclusive = dense[houses[:, first], houses[:, second]]
+        self._houses = houses[np.all(exclusive, axis=(1, 2))]
+        return self._houses
+
+    def _propagate(self) -> None:
+        """Wake the constraints and coverees watching each changed possible.
+
+        Runs until no more changes are queued. Calls made while already
+        propagating just return, leaving their changes on the queue.
+        """
+        if self._propagating:
+            return
+        self._propagating = True
+        try:
+            while self._changed:
+                self.propagation_passes += 1
+                if self.profile is not None:
+                    self.profile.propagation_passes += 1
+                changed = np.unique(np.concatenate(self._changed))
+                self._changed = []
+                for constraint in self._constraints_watching(changed):
+                    with self._timed(type(constraint).__name__, source=True):
+                        constraint.act_on_grid()
+                with self._timed("process_singleton_coverees", source=True):
+                    self.process_singleton_coverees(
+                        self._coverees_containing(changed)
+                    )
+                if self._nogoods:
+                    with self._timed("apply_nogoods", source=True):
+                        self._apply_nogoods(changed[self.finalised[changed]])
+        except SudokuContradiction:
+            self._changed = []
+            raise
+        finally:
+            self._propagating = False
+
+    def _constraints_watching(self, changed: np.ndarray) -> list:
+        if self._watchers is None:
+            self._watchers = self._build_watchers()
+        constraints, watch_mask = self._watchers
+        if not constraints:
             return []
+        woken = watch_mask[:, changed].any(axis=1)
+        return [c for c, wake in zip(constraints, woken) if wake]
+
+    def _coverees_containing(
+        self, changed: np.ndarray, unique: bool = True
+    ) -> np.ndarray:
+        if self._coveree_index is None:
+            self._coveree_index = split_rows(*self._build_coveree_index())
+        coveree_ids = gather_rows(self._coveree_index, changed)
+        return np.unique(coveree_ids) if unique else coveree_ids
+
+    def _build_watchers(self) -> tuple[list, np.ndarray]:
+        """List the constraints to wake, with a mask of what each watches."""
+        watched = [
+            (constraint, constraint.watched_indices())
+            for constraint in self.constraints
+        ]
+        watched = [(c, indices) for c, indices in watched if len(indices)]
+        watch_mask = np.zeros((len(watched), NUM_POSSIBLES + 1), bool)
+        for row, (_, indices) in zip(watch_mask, watched):
+            row[indices] = True
+        return [c for c, _ in watched], watch_mask
+
+    def _build_coveree_index(self) -> tuple[np.ndarray, np.ndarray]:
+        """CSR arrays mapping each possible to the coverees containing it."""
+        coveree_ids = np.repeat(
+            np.arange(len(self.coverees)), self.coverees.shape[1]
+        )
+        flat_coverees = self.coverees.reshape(-1)
+        in_use = flat_coverees != -1
+        return build_csr(
+            flat_coverees[in_use], coveree_ids[in_use], NUM_POSSIBLES + 1
+        )
 
-        if len(current_bifurcations) > MULTIPROCESS_TASK_COUNT:
-            return current_bifurcations + trivial_bifurcations
+    def _share_model(self) -> SharedArrays:
+        """Put the arrays that stay fixed during the solve in shared memory."""
+        if self._watchers is None:
+            self._watchers = self._build_watchers()
+        coveree_indptr, coveree_ids = self._build_coveree_index()
+        return SharedArrays(
+            {
+                "contradiction_indptr": self.contradictions.indptr,
+                "contradiction_indices": self.contradictions.indices,
+                "coverees": self.coverees,
+                "coveree_indptr": coveree_indptr,
+                "coveree_ids": coveree_ids,
+                "watch_mask": self._watchers[1],
+            }
+        )
 
-        next_level_bifurcations = []
-        for existing_bifurcations in current_bifurcations or [[]]:
-            with contextlib.ExitStack() as stack:
-                for idx in existing_bifurcations:
-                    stack.enter_context(self._bifurcate(idx, 1, 1))
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        if self._shared_model is not None:
+            # Send the grid but not the model, which the receiver attaches to.
+            # The trail and the counts derived from it are left behind too;
+            # the counts are rebuilt from the grid when next needed.
+            state.update(
+                contradictions=None,
+                _coverees=None,
+                _coveree_index=None,
+                _watchers=(self._watchers[0], None),
+                _trail=[],
+                _transpositions=None,
+                _exact_cover=None,
+                _mask_model=None,
+                _scores=None,
+                _coveree_remaining=None,
+                _coveree_finalised=None,
+                _counts_trail_length=0,
+            )
+        return state
 
-                idxs_to_bifurcate = self._select_bifurcation_coveree()
-                for new_idx in idxs_to_bifurcate:
-                    try:
-                        with self._bifurcate(new_idx, 1, 1):
-                            bifurcations_copy = copy.deepcopy(
-                                self.bifurcation_indices
-                            )
-                            if self.is_finished:
-                                trivial_bifurcations.append(bifurcations_copy)
-                            else:
-                                next_level_bifurcations.append(
-                                    bifurcations_copy
-                                )
-                    except SudokuContradiction:
-                        self.possibles[new_idx] = False
-
-        if not next_level_bifurcations:
-            return current_bifurcations + trivial_bifurcations
-        return self._list_bifurcations(
-            current_bifurcations=next_level_bifurcations,
-            trivial_bifurcations=trivial_bifurcations,
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        if self._shared_model is None:
+            return
+        arrays = self._shared_model.arrays
+        self.contradictions = ContradictionGraph.from_csr(
+            arrays["contradiction_indptr"], arrays["contradiction_indices"]
+        )
+        self._coverees = CovereeStore.from_array(arrays["coverees"])
+        self._coveree_index = split_rows(
+            arrays["coveree_indptr"], arrays["coveree_ids"]
         )
+        self._watchers = (self._watchers[0], arrays["watch_mask"])
 
-    def _logical_solve_til_no_change(self):
-        old_possibles = None
-        old_finalised = None
-        while old_possibles != tuple(self.possibles) or old_finalised != tuple(
-            self.finalised
-        ):
-            # TODO add pointing coverees (for each coveree, count indices
-            # leading to each contradictions, compare to coveree length).
-            # TODO add pair detection?? Seems costly
-            # TODO add constraints like KillerCages that check for validity.
-            for constraint in self.constraints:
-                constraint.act_on_grid()
-            self.process_singleton_coverees()
-            old_possibles = tuple(self.possibles)
-            old_finalised = tuple(self.finalised)
+    def _rebuild_counts(self) -> None:
+        self._scores = self.contradictions.neighbour_counts(
+            self.possibles & ~self.finalised
+        )
+        self._coveree_remaining = self.possibles[self.coverees].sum(axis=1)
+        self._coveree_finalised = self.finalised[self.coverees].sum(axis=1)
+        self._counts_trail_length = len(self._trail)
+
+    def _invalidate_counts(self) -> None:
+        self._scores = None
+        self._coveree_remaining = None
+        self._coveree_finalised = None
+        self._needs_full_pass = True
+
+    def _sync_counts(self) -> None:
+        """Apply the trail entries made since the counts were last updated."""
+        if self._scores is None:
+            self._rebuild_counts()
+            return
+        self._apply_trail_to_counts(
+            self._trail[self._counts_trail_length :], sign=-1
+        )
+        self._counts_trail_length = len(self._trail)
+
+    def _apply_trail_to_counts(self, entries: list, sign: int) -> None:
+        """Apply (sign=-1) or revert (sign=1) trail entries to the counts.
+
+        Every entry kills possibles that were live, since finalised possibles
+        can't be removed and removed ones can't be finalised.
+        """
+        if not entries:
+            return
+        removed = [indices for indices, finalised in entries if not finalised]
+        finalised = [indices for indices, finalised in entries if finalised]
+        num_coverees = len(self.coverees)
+        if removed:
+            removed = np.concatenate(removed)
+            self._coveree_remaining += sign * np.bincount(
+                self._coverees_containing(removed, unique=False),
+                minlength=num_coverees,
+            )
+        if finalised:
+            finalised = np.concatenate(finalised)
+            self._coveree_finalised -= sign * np.bincount(
+                self._coverees_containing(finalised, unique=False),
+                minlength=num_coverees,
+            )
+        killed = np.concatenate([indices for indices, _ in entries])
+        self._scores += sign * np.bincount(
+            self.contradictions.neighbours(killed),
+            minlength=NUM_POSSIBLES + 1,
+        )
 
     def _init_grid_constraints(self) -> None:
         for i in DIGITS:
@@ -262,133 +1343,240 @@ class Puzzle:
                     ]
                     self.add_coveree(indices)
 
-        for row in DIGITS:
-            for col in DIGITS:
-                indices = [self.possible_index(row, col, j) for j in DIGITS]
-                self.add_coveree(indices)
-
-                for d1, d2 in itertools.product(DIGITS, repeat=2):
-                    if d1 == d2:
-                        continue
+        cells = list(itertools.product(DIGITS, repeat=2))
+        cell_indices = self.get_indices_for_cells(cells)
+        for indices in cell_indices:
+            self.add_coveree(indices.tolist())
 
-                    i1 = self.possible_index(row, col, d1)
-                    i2 = self.possible_index(row, col, d2)
-                    self.add_contradiction(i1, i2)
+        # Each cell holds one digit.
+        d1, d2 = np.nonzero(~np.eye(NUM_DIGITS, dtype=bool))
+        self.add_contradictions_bulk(cell_indices[:, d1], cell_indices[:, d2])
 
-    def _select_bifurcation_coveree(self) -> list[int]:
-        possible_mask = self.possibles[self.coverees]
-        remaining_coverees = self.coverees * possible_mask - (1 - possible_mask)
+    def _smallest_open_coverees(self) -> np.ndarray:
+        """The open coverees with fewest options left, padded with -1 in
+        place of options that are no longer possible."""
+        self._sync_counts()
 
-        finalised_msak = np.any(self.finalised[remaining_coverees], axis=1)
-        remaining_coverees[finalised_msak] = -1
+        coveree_counts = self._coveree_remaining
+        open_coverees = (self._coveree_finalised == 0) & (coveree_counts >= 2)
+        if not np.any(open_coverees):
+            return np.zeros((0, self.coverees.shape[1]), dtype=int)
+        min_coveree_size = coveree_counts[open_coverees].min()
 
-        coveree_counts = (remaining_coverees != -1).sum(axis=1)
-        coveree_counts[coveree_counts < 2] = MAX_COVEREE_SIZE + 1
-        min_coveree_size = coveree_counts.min()
+        candidate_coverees = self.coverees[
+            open_coverees & (coveree_counts == min_coveree_size)
+        ]
+        return np.where(
+            self.possibles[candidate_coverees], candidate_coverees, -1
+        )
 
-        if min_coveree_size == MAX_COVEREE_SIZE + 1:
+    def _select_bifurcation_coveree(self) -> list[int]:
+        candidate_coverees = self._smallest_open_coverees()
+        if not len(candidate_coverees):
             return []
-
-        candidate_coverees = remaining_coverees[
-            coveree_counts == min_coveree_size
-        ]
         # If I bifurcate on this index, how many possibles get removed
-        possibles_removed = (
-            self.contradictions * self.possibles * (1 - self.finalised)
-        ).sum(axis=1)
-        possibles_removed_per_coveree = possibles_removed[
-            candidate_coverees
-        ].sum(axis=1)
+        scores = self._scores
+        if self._probe_is_current():
+            scores = self._probe_removals
+        possibles_removed_per_coveree = scores[candidate_coverees].sum(axis=1)
         best_coveree = np.argmax(possibles_removed_per_coveree)
         output = [idx for idx in candidate_coverees[best_coveree] if idx != -1]
         return output
 
     @contextlib.contextmanager
-    def _bifurcate(self, index: int, num_options: int, current_num: int):
+    def _bifurcate(
+        self, options: list[int], num_options: int, current_num: int
+    ):
+        index = options[current_num]
         bifurcation = Bifurcation(
             index=index,
-            possibles=self.possibles,
-            finalised=self.finalised,
+            trail_length=len(self._trail),
+            options=options,
             num_options=num_options,
             current_option_num=current_num,
         )
-        self.possibles = copy.deepcopy(self.possibles)
-        self.finalised = copy.deepcopy(self.finalised)
+        if not self.bifurcations:
+            self.unbifurcated_possibles = self.possibles.copy()
         try:
             self.bifurcations.append(bifurcation)
-            self.finalise([index])
+            self.finalise(
+                [index], reason=_level_bit(len(self.bifurcations) - 1)
+            )
             yield
-        except SudokuContradiction:
-            raise
         finally:
             self.bifurcations.pop()
-            self.possibles = bifurcation.possibles
-            self.finalised = bifurcation.finalised
+            self._undo(bifurcation.trail_length)
+
+    def _undo(self, trail_length: int) -> None:
+        """Roll back every change made since the trail had this length."""
+        with self._timed("undo"):
+            if self._scores is not None:
+                self._apply_trail_to_counts(
+                    self._trail[trail_length : self._counts_trail_length],
+                    sign=1,
+                )
+                self._counts_trail_length = min(
+                    self._counts_trail_length, trail_length
+                )
+            while len(self._trail) > trail_length:
+                indices, were_finalised = self._trail.pop()
+                if were_finalised:
+                    self.finalised[indices] = False
+                else:
+                    self.possibles[indices] = True
+            self._changed = []
+
+    def finalise(
+        self, possible_indices: list[int], reason: int | None = None
+    ) -> None:
+        """Mark the given possibles as finalised.
+
+        `reason` masks the bifurcation levels this follows from, by default
+        all of the current ones.
+        """
+        if reason is None:
+            reason = _levels_mask(len(self.bifurcations))
+        with self._timed("finalise"):
+            possible_indices = np.asarray(possible_indices, dtype=int)
+            not_yet_finalised = np.unique(
+                possible_indices[~self.finalised[possible_indices]]
+            )
+            if len(not_yet_finalised):
+                removed = not_yet_finalised[~self.possibles[not_yet_finalised]]
+                if len(removed):
+                    raise SudokuContradiction(
+                        "Trying to finalise removed digit!",
+                        levels=reason | self._reason_of(removed),
+                    )
+                self.finalised[not_yet_finalised] = True
+                self._reasons[not_yet_finalised] = reason
+                self._trail.append((not_yet_finalised, True))
+                self._changed.append(not_yet_finalised)
+                self.remove_possibles(
+                    self.contradictions.neighbours(not_yet_finalised), reason
+                )
+        self._propagate()
 
-    def finalise(self, possible_indices: list[int]) -> None:
-        """Mark the given possibles as finalised."""
-        not_yet_finalised = [
-            idx for idx in possible_indices if not self.finalised[idx]
-        ]
-        if not not_yet_finalised:
-            return
-        self.finalised[not_yet_finalised] = True
-        adjacent_contradictions = (
-            self.contradictions[not_yet_finalised].sum(axis=0) > 0
-        )
-        if np.any(self.finalised[adjacent_contradictions]):
-            raise SudokuContradiction("Trying to remove finalised digit!")
-        self.possibles[adjacent_contradictions] = False
+    def remove_possibles(
+        self, possible_indices: list[int], reason: int | None = None
+    ) -> None:
+        """Mark the given possibles as impossible.
 
-        if self.is_finished:
-            # Final check for contradictions in constraints.
-            self._logical_solve_til_no_change()
-            self._add_solution(self.possibles)
+        The removal is propagated by the next `finalise` or logical solve.
+        `reason` is as for `finalise`.
+        """
+        if reason is None:
+            reason = _levels_mask(len(self.bifurcations))
+        possible_indices = np.asarray(possible_indices, dtype=int)
+        still_possible = np.unique(
+            possible_indices[self.possibles[possible_indices]]
+        )
+        if not len(still_possible):
             return
+        finalised = still_possible[self.finalised[still_possible]]
+        if len(finalised):
+            raise SudokuContradiction(
+                "Trying to remove finalised digit!",
+                levels=reason | self._reason_of(finalised),
+            )
+        self.possibles[still_possible] = False
+        self._reasons[still_possible] = reason
+        self._trail.append((still_possible, False))
+        self._changed.append(still_possible)
 
-        self.process_singleton_coverees()
+    def _add_solution(
+        self, possibles: np.ndarray | None = None
+    ) -> np.ndarray | None:
+        """The digits of the finished grid, or of `possibles` if given.
 
-    def _add_solution(self, indices):
-        self.solutions.add(tuple(self.possibles))
-        if self.multiprocess_lock is not None:
-            with self.multiprocess_lock:
-                self.multiprocess_solution_count[self.multiprocessing_id] = len(
-                    self.solutions
-                )
-        self.in_valid_solutions[self.possibles] = True
-
-    def process_singleton_coverees(self) -> None:
-        """Return indices that are the only option left in their coverees."""
-        possible_mask = self.possibles[self.coverees]
-        remaining_coverees = self.coverees * possible_mask - (1 - possible_mask)
-        coveree_counts = (remaining_coverees != -1).sum(axis=1)
-        if np.any(coveree_counts == 0):
-            raise SudokuContradiction("Coveree no longer possible")
-        singleton_coverees = remaining_coverees[coveree_counts == 1]
-        indices = np.unique(singleton_coverees).tolist()
-        if indices:
-            indices.remove(-1)
-            self.finalise(indices)
+        Returns None when only counting.
+        """
+        if possibles is None:
+            possibles = self.possibles
+        self._num_solutions += 1
+        if self._count_only:
+            return None
+        self.in_valid_solutions[possibles] = True
+        return self.possibles_to_digits(possibles)
+
+    def _add_cached_solution(self, digits: np.ndarray) -> np.ndarray:
+        self._num_solutions += 1
+        self.in_valid_solutions[self.digits_to_possibles(digits)] = True
+        return digits.copy()
+
+    def process_singleton_coverees(self, coveree_ids=None) -> None:
+        """Finalise indices that are the only option left in their coverees.
+
+        Checks every coveree unless `coveree_ids` is given.
+        """
+        coverees = self.coverees
+        if coveree_ids is not None:
+            coverees = coverees[coveree_ids]
+        possible_mask = self.possibles[coverees]
+        coveree_counts = possible_mask.sum(axis=1)
+        empty = coveree_counts == 0
+        if np.any(empty):
+            raise SudokuContradiction(
+                "Coveree no longer possible",
+                levels=self._reason_of(coverees[empty]),
+            )
+        singletons = coveree_counts == 1
+        if np.any(singletons):
+            self.finalise(
+                coverees[singletons][possible_mask[singletons]],
+                reason=self._reason_of(coverees[singletons]),
+            )
 
     def add_coveree(self, coveree: list[int]) -> None:
         """Add a coveree.
 
         A coveree is a list of possible indices, one of which must be true.
         """
-        if len(coveree) > MAX_COVEREE_SIZE:
-            msg = f"Coveree {coveree} too long. Max size is {MAX_COVEREE_SIZE}."
-            raise ValueError(msg)
-
-        padded = coveree + [-1] * (MAX_COVEREE_SIZE - len(coveree))
-        if self.coverees.shape != (0,):
-            self.coverees = np.vstack([self.coverees, [padded]])
-        else:
-            self.coverees = np.array([padded])
+        self._coverees.append(coveree)
+        self._coveree_index = None
+        self._transpositions = None
+        self._exact_cover = None
+        self._mask_model = None
+        self._houses = None
+        self._invalidate_counts()
+
+    def add_constraint(self, constraint) -> None:
+        """Register a constraint so it is woken during the solve."""
+        self.constraints.append(constraint)
+        self._watchers = None
+        self._transpositions = None
+        self._exact_cover = None
+        self._mask_model = None
+        self._invalidate_counts()
 
     def add_contradiction(self, i1: int, i2: int) -> None:
         """Add a contradiction."""
-        self.contradictions[i1, i2] = True
-        self.contradictions[i2, i1] = True
+        self.contradictions.add(i1, i2)
+        self._transpositions = None
+        self._exact_cover = None
+        self._mask_model = None
+        self._houses = None
+        if self._scores is not None:
+            self._invalidate_counts()
+
+    def add_contradictions_bulk(self, i1: np.ndarray, i2: np.ndarray) -> None:
+        """Add a contradiction between each pair of possible indices.
+
+        The index arrays are broadcast against each other.
+        """
+        i1, i2 = np.broadcast_arrays(i1, i2)
+        if i1.size and (
+            min(i1.min(), i2.min()) < 0
+            or max(i1.max(), i2.max()) >= NUM_POSSIBLES
+        ):
+            raise ValueError("Contradiction indices out of range.")
+        self.contradictions.add_many(i1.reshape(-1), i2.reshape(-1))
+        self._transpositions = None
+        self._exact_cover = None
+        self._mask_model = None
+        self._houses = None
+        if self._scores is not None:
+            self._invalidate_counts()
 
     def __setitem__(self, key: tuple[int, int], value: int | list[int]):
         if not isinstance(value, collections.abc.Iterable):
@@ -403,9 +1591,14 @@ class Puzzle:
                 indices_to_remove.append(index)
 
         if indices_to_remove:
-            self.possibles[indices_to_remove] = False
+            self.remove_possibles(indices_to_remove)
             self.process_singleton_coverees()
 
+    @property
+    def coverees(self) -> np.ndarray:
+        """The coverees as a 2D array of possible indices, padded with -1."""
+        return self._coverees.array
+
     @property
     def is_finished(self):
         return np.sum(self.finalised) == NUM_CELLS
@@ -431,6 +1624,9 @@ class Puzzle:
     def possible_index(row: int, col: int, possible: int) -> int:
         return Puzzle._cell_start_index(row, col) + (possible - 1)
 
+    possibles_to_digits = staticmethod(possibles_to_digits)
+    digits_to_possibles = staticmethod(digits_to_possibles)
+
     # Drawing code
     def simple_draw(self, state: np.ndarray | None = None) -> None:
         if state is None:
@@ -469,11 +1665,15 @@ class Puzzle:
         curses.init_pair(3, 0, -1)  # Unbifurcated possible
 
     def _update_multiprocess_progress(self, override_value=None):
-        if self.multiprocess_lock is not None:
-            with self.multiprocess_lock:
-                self.multiprocess_progress_dict[self.multiprocessing_id] = (
-                    override_value or self.progress
-                )
+        if self.multiprocess_progress is not None:
+            # Only count the part of the task this worker kept for itself.
+            progress = min(
+                self._task.weight * self.progress,
+                self._task.weight - self._donated_weight,
+            )
+            if override_value is not None:
+                progress = override_value
+            self.multiprocess_progress[self.multiprocessing_id] = progress
             return
 
     def _refresh_screen(self):
@@ -588,3 +1788,169 @@ class Puzzle:
     @staticmethod
     def _describe_possible_index(index: int) -> str:
         return f"R{index // 81 + 1}C{(index // 9) % 9 + 1} = {index % 9 + 1}"
+
+
+def _check_engine(engine: str, parallel: bool) -> None:
+    if engine not in ENGINES:
+        raise ValueError(
+            f"Unknown engine {engine!r}, expected one of {ENGINES}."
+        )
+    if engine != "propagation" and parallel:
+        raise ValueError(
+            f"The {engine} engine can't run in a terminal or multiple "
+            "processes."
+        )
+
+
+def _level_bit(level: int) -> int:
+    return 1 << min(level, NUM_LEVEL_BITS - 1)
+
+
+def _levels_mask(num_levels: int) -> int:
+    """The mask of the first `num_levels` bifurcation levels."""
+    return (1 << min(num_levels, NUM_LEVEL_BITS)) - 1
+
+
+def _search_worker(
+    puzzle: Puzzle,
+    worker_id: int,
+    task_queue: multiprocessing.Queue,
+    result_queue: multiprocessing.Queue,
+    idle_workers: RawArray,
+    limit: int | None,
+) -> None:
+    puzzle.multiprocessing_id = worker_id
+    puzzle._idle_workers = idle_workers
+    puzzle._task_results = result_queue
+    # While counting, counts are sent in batches once a frame, except for
+    # the first `limit`, which might be all the parent is waiting for.
+    num_found = 0
+    num_unsent = 0
+    last_send_time = 0
+    while True:
+        try:
+            task = task_queue.get_nowait()
+        except queue.Empty:
+            idle_workers[worker_id] = True
+            task = task_queue.get()
+            idle_workers[worker_id] = False
+        if task is None:
+            return
+
+        # Only this task's share of the totals is sent back.
+        puzzle.search_nodes = 0
+        puzzle.propagation_passes = 0
+        puzzle.stage_stats = {}
+        if puzzle.profile is not None:
+            puzzle.profile = SolveProfile()
+        try:
+            for solution in puzzle._solve_task(task):
+                if not puzzle._count_only:
+                    result_queue.put(("solution", solution))
+                    continue
+                num_found += 1
+                num_unsent += 1
+                if (limit is not None and num_found <= limit) or (
+                    time.time() - last_send_time >= 1 / FRAME_RATE
+                ):
+                    result_queue.put(("count", num_unsent))
+                    num_unsent = 0
+                    last_send_time = time.time()
+            if num_unsent:
+                result_queue.put(("count", num_unsent))
+                num_unsent = 0
+            puzzle._update_multiprocess_progress(override_value=0)
+        except Exception:
+            result_queue.put(("error", traceback.format_exc()))
+            return
+        result_queue.put(
+            (
+                "done",
+                TaskReport(
+                    weight=task.weight - puzzle._donated_weight,
+                    search_nodes=puzzle.search_nodes,
+                    propagation_passes=puzzle.propagation_passes,
+                    stage_stats=puzzle.stage_stats,
+                    profile=puzzle.profile,
+                ),
+            )
+        )
+
+
+@functools.cache
+def _subset_combinations(size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Every choice of `size` of 9 rows, and a mask of the rows not chosen."""
+    chosen = np.array(list(itertools.combinations(range(NUM_DIGITS), size)))
+    not_chosen = np.ones((len(chosen), NUM_DIGITS), dtype=bool)
+    np.put_along_axis(not_chosen, chosen, False, axis=1)
+    return chosen, not_chosen
+
+
+def _subset_eliminations(options: np.ndarray) -> np.ndarray:
+    """Find the options ruled out by naked subsets in a stack of 9x9 grids.
+
+    When N unsolved rows of a grid only have options in N columns between
+    them, the other rows can't use those columns. Raises if they have fewer.
+    """
+    popcounts = np.asarray(POPCOUNTS)
+    column_bits = 1 << np.arange(NUM_DIGITS)
+    row_masks = options.astype(np.int64) @ column_bits
+    unsolved = popcounts[row_masks] >= 2
+    eliminated_masks = np.zeros_like(row_masks)
+    for size in range(2, MAX_SUBSET_SIZE + 1):
+        chosen, not_chosen = _subset_combinations(size)
+        union_masks = np.bitwise_or.reduce(row_masks[:, chosen], axis=2)
+        union_sizes = popcounts[union_masks]
+        candidates = np.all(unsolved[:, chosen], axis=2)
+        if np.any(candidates & (union_sizes < size)):
+            raise SudokuContradiction("Too few options left for a subset.")
+        grids, subsets = np.nonzero(candidates & (union_sizes == size))
+        for grid, subset in zip(grids, subsets):
+            eliminated_masks[grid, not_chosen[subset]] |= union_masks[
+                grid, subset
+            ]
+    eliminated = (eliminated_masks[:, :, np.newaxis] & column_bits) != 0
+    return eliminated & options
+
+
+@functools.cache
+def _standard_grid() -> Puzzle:
+    """Build the plain sudoku that every new puzzle is copied from.
+
+    Built once per process. The copies share its contradiction arrays, which
+    are made read-only, and its coverees.
+    """
+    grid = Puzzle.__new__(Puzzle)
+    grid._init_state()
+    grid._init_grid_constraints()
+    # Split the graph's rows now so that the copies share them.
+    grid.contradictions.neighbours([])
+    grid._coveree_index = split_rows(*grid._build_coveree_index())
+    for array in [grid.contradictions.indptr, grid.contradictions.indices]:
+        array.flags.writeable = False
+    return grid
+
+
+# The puzzle that `solve_variants` pool workers copy for each variant.
+_variant_base = None
+
+
+def _init_variant_worker(puzzle: Puzzle) -> None:
+    global _variant_base
+    _variant_base = puzzle
+
+
+def _solve_base_variant(args: tuple) -> list[np.ndarray]:
+    variant, limit = args
+    return _solve_variant(_variant_base, variant, limit)
+
+
+def _solve_variant(
+    base: Puzzle, variant: Callable[[Puzzle], None], limit: int | None
+) -> list[np.ndarray]:
+    puzzle = base.copy()
+    try:
+        variant(puzzle)
+        return list(puzzle.iter_solutions(limit))
+    except SudokuContradiction:
+        return []
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import collections
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Where an array lives inside a shared memory block.
+ArrayLayout = collections.namedtuple(
+    "ArrayLayout", ["dtype", "shape", "offset"]
+)
+
+# Byte alignment of each array within the block.
+ALIGNMENT = 8
+
+
+class SharedArrays:
+    """Read-only numpy arrays packed into a single shared memory block.
+
+    The process that creates the block owns it and must `unlink` it once every
+    user is done. Pickling only sends the block's name and layout, so other
+    processes attach to the same memory instead of receiving a copy.
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        layout = {}
+        size = 0
+        for key, array in arrays.items():
+            offset = -(-size // ALIGNMENT) * ALIGNMENT
+            layout[key] = ArrayLayout(array.dtype.str, array.shape, offset)
+            size = offset + array.nbytes
+
+        self._memory = shared_memory.SharedMemory(
+            create=True, size=max(size, 1)
+        )
+        self._layout = layout
+        self.arrays = self._views(writeable=True)
+        for key, array in arrays.items():
+            self.arrays[key][...] = array
+            self.arrays[key].flags.writeable = False
+
+    def _views(self, writeable: bool = False) -> dict[str, np.ndarray]:
+        views = {}
+        for key, (dtype, shape, offset) in self._layout.items():
+            view = np.ndarray(
+                shape, dtype=dtype, buffer=self._memory.buf, offset=offset
+            )
+            view.flags.writeable = writeable
+            views[key] = view
+        return views
+
+    def __getstate__(self) -> tuple[str, dict]:
+        return self._memory.name, self._layout
+
+    def __setstate__(self, state: tuple[str, dict]) -> None:
+        name, self._layout = state
+        self._memory = shared_memory.SharedMemory(name=name)
+        self.arrays = self._views()
+
+    def __enter__(self) -> SharedArrays:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.unlink()
+
+    def unlink(self) -> None:
+        """Release the block. Only call this from the creating process."""
+        self.arrays = {}
+        self._memory.close()
+        self._memory.unlink()
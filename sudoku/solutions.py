@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import os
+
+import numpy as np
+
+NUM_CELLS = 81
+NUM_DIGITS = 9
+NUM_POSSIBLES = NUM_CELLS * NUM_DIGITS
+# Bytes per solution once two digits are packed into each byte.
+PACKED_SIZE = (NUM_CELLS + 1) // 2
+
+# Start of every solution file, followed by one 81 byte record per solution.
+MAGIC = b"SUDOKU81"
+
+
+def possibles_to_digits(possibles: np.ndarray) -> np.ndarray:
+    """Compact finished grids to their 81 digits, in reading order.
+
+    Takes a single possibles array or a 2D batch of them.
+    """
+    possibles = np.asarray(possibles)
+    cells = possibles[..., :NUM_POSSIBLES].reshape(
+        possibles.shape[:-1] + (NUM_CELLS, NUM_DIGITS)
+    )
+    return (cells.argmax(axis=-1) + 1).astype(np.uint8)
+
+
+def digits_to_possibles(digits: np.ndarray) -> np.ndarray:
+    """Expand 81 digits (or a 2D batch of them) back to possibles arrays.
+
+    The output has the trailing always-impossible index used by `Puzzle`.
+    """
+    digits = np.asarray(digits, dtype=np.intp)
+    cells = np.zeros(digits.shape + (NUM_DIGITS,), dtype=bool)
+    np.put_along_axis(cells, digits[..., np.newaxis] - 1, True, axis=-1)
+    possibles = np.zeros(digits.shape[:-1] + (NUM_POSSIBLES + 1,), dtype=bool)
+    possibles[..., :NUM_POSSIBLES] = cells.reshape(
+        digits.shape[:-1] + (NUM_POSSIBLES,)
+    )
+    return possibles
+
+
+def pack_digits(digits: np.ndarray) -> np.ndarray:
+    """Pack solutions two digits per byte, to 41 bytes each."""
+    digits = np.asarray(digits, dtype=np.uint8)
+    padded = np.zeros(digits.shape[:-1] + (2 * PACKED_SIZE,), dtype=np.uint8)
+    padded[..., :NUM_CELLS] = digits
+    return (padded[..., 0::2] << 4) | padded[..., 1::2]
+
+
+def unpack_digits(packed: np.ndarray) -> np.ndarray:
+    """Inverse of `pack_digits`."""
+    packed = np.asarray(packed, dtype=np.uint8)
+    digits = np.empty(packed.shape[:-1] + (2 * PACKED_SIZE,), dtype=np.uint8)
+    digits[..., 0::2] = packed >> 4
+    digits[..., 1::2] = packed & 0xF
+    return digits[..., :NUM_CELLS]
+
+
+class SolutionWriter:
+    """Append solutions to a binary solution file.
+
+    Creates the file if needed. Records are written whole, so a file cut
+    short by a crash loses at most the record being written. Reopening such
+    a file drops the partial record before appending.
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = path
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size:
+            _check_magic(path)
+            num_solutions = (size - len(MAGIC)) // NUM_CELLS
+            os.truncate(path, len(MAGIC) + num_solutions * NUM_CELLS)
+        self._file = open(path, "ab")
+        if not size:
+            self._file.write(MAGIC)
+
+    def write(self, digits: np.ndarray) -> None:
+        """Append one solution, or a 2D batch of them."""
+        digits = np.asarray(digits, dtype=np.uint8)
+        if digits.shape[-1] != NUM_CELLS:
+            raise ValueError(
+                f"Solutions must have {NUM_CELLS} digits, got shape "
+                f"{digits.shape}."
+            )
+        self._file.write(digits.tobytes())
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> SolutionWriter:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def load_solutions(path: str | os.PathLike, mmap: bool = True) -> np.ndarray:
+    """Load a solution file as an (n, 81) uint8 array of digits.
+
+    By default the file is memory-mapped read-only rather than read in.
+    A trailing partial record is ignored.
+    """
+    _check_magic(path)
+    num_solutions = (os.path.getsize(path) - len(MAGIC)) // NUM_CELLS
+    if num_solutions == 0:
+        return np.zeros((0, NUM_CELLS), dtype=np.uint8)
+    if mmap:
+        return np.memmap(
+            path,
+            dtype=np.uint8,
+            mode="r",
+            offset=len(MAGIC),
+            shape=(num_solutions, NUM_CELLS),
+        )
+    with open(path, "rb") as fp:
+        fp.seek(len(MAGIC))
+        data = np.fromfile(fp, dtype=np.uint8, count=num_solutions * NUM_CELLS)
+    return data.reshape(num_solutions, NUM_CELLS)
+
+
+def _check_magic(path: str | os.PathLike) -> None:
+    with open(path, "rb") as fp:
+        if fp.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a solution file.")
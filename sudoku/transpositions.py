@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import numpy as np
+
+from sudoku.lru import LRUCache
+
+
+class TranspositionTable:
+    """The solutions below previously searched grids.
+
+    Each grid has either the digits of its solutions or, if it was searched
+    while counting, just their number. Grids are keyed on their possibles packed into bits, so a hit is always
+    exact. Holds at most `capacity` grids, as an `LRUCache`.
+    """
+
+    def __init__(self, capacity: int):
+        self._solutions = LRUCache(capacity)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._solutions)
+
+    @staticmethod
+    def key(possibles: np.ndarray) -> bytes:
+        return np.packbits(possibles).tobytes()
+
+    def get(
+        self, key: bytes, count_only: bool = False
+    ) -> np.ndarray | int | None:
+        """The (n, 81) digits of every solution below the grid, if known.
+
+        With `count_only`, may return the number of solutions instead.
+        """
+        solutions = self._solutions.get(key)
+        if solutions is None or (isinstance(solutions, int) and not count_only):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return solutions
+
+    def put(self, key: bytes, solutions: np.ndarray | int) -> None:
+        if isinstance(solutions, np.ndarray):
+            solutions.flags.writeable = False
+        self._solutions.put(key, solutions)
+
+    def clear(self) -> None:
+        self._solutions.clear()
@@ -0,0 +1,26 @@
+import pytest
+
+from sudoku.puzzle import Puzzle
+
+# Givens with three solutions.
+GIVENS = [
+    [0, 2, 0, 0, 0, 0, 0, 0, 0],
+    [0, 9, 6, 0, 1, 5, 0, 0, 0],
+    [5, 0, 7, 0, 3, 0, 1, 0, 0],
+    [0, 3, 0, 5, 0, 0, 0, 0, 4],
+    [2, 0, 1, 4, 0, 8, 9, 0, 3],
+    [8, 0, 0, 0, 0, 9, 0, 1, 0],
+    [0, 0, 5, 0, 9, 0, 2, 0, 8],
+    [9, 0, 0, 1, 8, 0, 3, 5, 0],
+    [0, 6, 0, 2, 0, 0, 0, 9, 0],
+]
+
+
+@pytest.fixture
+def puzzle() -> Puzzle:
+    puzzle = Puzzle()
+    for row, digits in enumerate(GIVENS, 1):
+        for column, digit in enumerate(digits, 1):
+            if digit:
+                puzzle[row, column] = digit
+    return puzzle
@@ -0,0 +1,41 @@
+import numpy as np
+
+from sudoku.puzzle import ENGINES, Puzzle
+
+
+def solutions(puzzle: Puzzle, engine: str) -> list[tuple]:
+    return sorted(
+        tuple(solution.tolist())
+        for solution in puzzle.copy().iter_solutions(engine=engine)
+    )
+
+
+def test_engines_agree(puzzle):
+    expected = solutions(puzzle, "propagation")
+    assert len(expected) == 3
+    for engine in ENGINES:
+        assert solutions(puzzle, engine) == expected
+
+
+def test_self_contradiction_rules_out_possible(puzzle):
+    all_solutions = np.array(solutions(puzzle, "propagation"))
+    # A cell and digit used by some solutions but not all.
+    cell = np.flatnonzero(np.any(all_solutions != all_solutions[0], axis=0))[0]
+    digit = all_solutions[0, cell]
+    index = Puzzle.possible_index(cell // 9 + 1, cell % 9 + 1, digit)
+    puzzle.add_contradiction(index, index)
+
+    expected = solutions(puzzle, "propagation")
+    assert 0 < len(expected) < len(all_solutions)
+    for engine in ENGINES:
+        assert solutions(puzzle, engine) == expected
+
+
+def test_digit_contradicting_itself_everywhere():
+    puzzle = Puzzle()
+    for row in range(1, 10):
+        for column in range(1, 10):
+            index = Puzzle.possible_index(row, column, 4)
+            puzzle.add_contradiction(index, index)
+    for engine in ENGINES:
+        assert solutions(puzzle, engine) == []
@@ -0,0 +1,19 @@
+def test_repeated_count_hits_cache(puzzle):
+    puzzle.set_transposition_table()
+    assert puzzle.count_solutions() == 3
+    search_nodes = puzzle.search_nodes
+    hits = puzzle._transpositions.hits
+
+    assert puzzle.count_solutions() == 3
+    assert not puzzle.is_unique()
+    assert puzzle._transpositions.hits == hits + 2
+    assert puzzle.search_nodes == search_nodes + 2
+
+
+def test_counts_dont_stand_in_for_solutions(puzzle):
+    puzzle.set_transposition_table()
+    expected = sorted(tuple(s.tolist()) for s in puzzle.copy().iter_solutions())
+    assert puzzle.count_solutions() == 3
+    found = sorted(tuple(s.tolist()) for s in puzzle.iter_solutions())
+    assert found == expected
+    assert puzzle.count_solutions() == 3